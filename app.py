@@ -1,30 +1,88 @@
 # ---------- app.py ----------
 import json
 
-import matplotlib.pyplot as plt
-import pandas as pd
 import streamlit as st
 
-from backend import compute_win_ratio
-from tppwb import tppwb_matches, tppwb_player_info
+from backend import (
+    compute_match_impacts,
+    compute_ratio_curve,
+    compute_win_ratio_vectorized,
+)
+from cache import get_cache
+from charts import render_ratio_chart
+from matchtable import MatchTable
+from streaming import iter_json_array
+from timing import count, span, start_recording, stop_recording, to_prometheus
+from tppwb import tppwb_matches_streaming, tppwb_player_info
 
 st.set_page_config(
     page_title="Calculateur classement AFT padel", page_icon="🎾", layout="centered"
 )
 st.title("📊 Calculateur de classement AFT Padel Wallonie-Bruxelles")
 
+# Matches of the session, in the compact format of matchtable.py
 if "matches" not in st.session_state:
-    st.session_state["matches"] = []
+    st.session_state["matches"] = MatchTable.empty()
 
 if "flag_uploaded_file" not in st.session_state:
     st.session_state["flag_uploaded_file"] = False
 
+# Performance panel, enabled with "?debug=1" in the URL (next to affiliation_number)
+debug_mode = hasattr(st, "query_params") and st.query_params.get("debug") == "1"
+if debug_mode:
+    start_recording()
+else:
+    stop_recording()
+
+# Ratio chart drawn by the browser, "?chart=matplotlib" for the PNG version
+chart_backend = (
+    st.query_params.get("chart", "vega") if hasattr(st, "query_params") else "vega"
+)
+
+# ---------- Memoized computations ----------
+# Shared by all sessions and reruns, with a bounded number of entries.
+RESULTS_CACHE_ENTRIES = 256
+PLAYER_INFO_CACHE_ENTRIES = 1024
+PLAYER_INFO_TTL = 3600
+
+
+# Keyed on the content hash of the match table (MatchTable.digest), the table
+# itself is not hashed by Streamlit (leading underscore)
+@st.cache_data(max_entries=RESULTS_CACHE_ENTRIES, show_spinner=False)
+def compute_results(digest, _matches):
+    count("results_cache.miss")
+    with span("compute_win_ratio"):
+        win_ratio, recommendation, match_weights = compute_win_ratio_vectorized(
+            _matches
+        )
+    with span("ratio_curve"):
+        ratios = compute_ratio_curve(_matches)
+    with span("match_impacts"):
+        impacts, _, recommendations_without = compute_match_impacts(_matches)
+    # pandas is only needed for the table of matches
+    df = _matches.to_frame()
+    df["coefficient_total"] = match_weights
+    df["impact_ratio"] = impacts
+    # Only shown for the matches that change the recommendation
+    df["recommandation_sans_ce_match"] = [
+        r if r != recommendation else "" for r in recommendations_without
+    ]
+    return df, win_ratio, recommendation, ratios
+
+
+@st.cache_data(
+    max_entries=PLAYER_INFO_CACHE_ENTRIES, ttl=PLAYER_INFO_TTL, show_spinner=False
+)
+def cached_player_info(affiliation_number):
+    return tppwb_player_info(affiliation_number)
+
+
 # ---------- Retrieve data from the TPPWB website ----------
 
 # Parse affiliation number from the URL GET parameters if provided
 affiliation_prefill = ""
 if hasattr(st, "query_params") and st.query_params:
-    affiliation_prefill = st.query_params.get("affiliation_number")
+    affiliation_prefill = st.query_params.get("affiliation_number", "")
 
 
 with st.form("affiliation_form", clear_on_submit=False):
@@ -42,7 +100,12 @@ with st.form("affiliation_form", clear_on_submit=False):
         )
 
     with col_btn:
-        if (load_matches and affiliation_number) or affiliation_prefill:
+        # The affiliation number of the URL is only loaded once per session
+        prefill_pending = (
+            affiliation_prefill
+            and st.session_state.get("prefill_loaded") != affiliation_prefill
+        )
+        if (load_matches and affiliation_number) or prefill_pending:
             if not (
                 isinstance(affiliation_number, str)
                 and affiliation_number.isdigit()
@@ -51,12 +114,18 @@ with st.form("affiliation_form", clear_on_submit=False):
                 st.error("❌ Veuillez entrer un numéro d'affiliation valide.")
                 st.stop()
 
+            if prefill_pending:
+                st.session_state["prefill_loaded"] = affiliation_prefill
+
             # Reset session in case previous data exists
-            st.session_state["matches"] = []
+            st.session_state["matches"] = MatchTable.empty()
             st.session_state["flag_uploaded_file"] = False
 
             try:
-                matches, category_change, date_from = tppwb_matches(affiliation_number)
+                # Normalized while downloaded, cached once normalized
+                matches, category_change, date_from = tppwb_matches_streaming(
+                    affiliation_number
+                )
 
                 # st.write(matches)
 
@@ -64,7 +133,7 @@ with st.form("affiliation_form", clear_on_submit=False):
                     if len(matches) > 0:
 
                         st.success(f"✅ Matchs chargés (à partir du {date_from}) !")
-                        st.session_state["matches"] = matches
+                        st.session_state["matches"] = MatchTable.from_dicts(matches)
                         st.session_state["flag_uploaded_file"] = True
                     else:
                         st.warning(
@@ -86,7 +155,8 @@ with st.form("affiliation_form", clear_on_submit=False):
 # ---------- DISPLAY RESULTS ----------
 if len(affiliation_number) == 7:
     try:
-        player_infos = tppwb_player_info(affiliation_number)
+        with span("tppwb.player_info"):
+            player_infos = cached_player_info(affiliation_number)
         player_info = (
             player_infos[0] if isinstance(player_infos, list) and player_infos else None
         )
@@ -101,150 +171,201 @@ if len(affiliation_number) == 7:
         st.write(player_info)
         player_info = {}
 
-if st.session_state["matches"]:
-    # DEBUG
-    # st.write(st.session_state["matches"])
 
-    df = pd.DataFrame(st.session_state["matches"])
-    win_ratio, recommendation, match_weights = compute_win_ratio(df)
-    df["coefficient_total"] = match_weights
+# Results and their buttons: the download button only reruns this part
+@st.fragment
+def results_section():
+    if st.session_state["matches"]:
+        # DEBUG
+        # st.write(st.session_state["matches"])
 
-    st.markdown(f"### 🧶 Pourcentage de victoires ajusté : {win_ratio}%")
-    st.info(f"📌 Recommandation : {recommendation}")
+        matches = st.session_state["matches"]
+        with span("compute_results"):
+            df, win_ratio, recommendation, ratios = compute_results(
+                matches.digest(), matches
+            )
 
-    # ---------- PLOT RATIO EVOLUTION ----------
-    st.subheader("📈 Évolution du ratio de victoire")
-    ratios = []
-    for i in range(1, len(df) + 1):
-        sub_df = df.iloc[:i]
-        ratio, _, _ = compute_win_ratio(sub_df)
-        ratios.append(ratio)
+        st.markdown(f"### 🧶 Pourcentage de victoires ajusté : {win_ratio}%")
+        st.info(f"📌 Recommandation : {recommendation}")
 
-    fig, ax = plt.subplots()
-    ax.plot(range(1, len(ratios) + 1), ratios, marker="o", color="orangered", lw=2)
-    xticks = {1, len(ratios)}  # always include first and last
+        # ---------- PLOT RATIO EVOLUTION ----------
+        st.subheader("📈 Évolution du ratio de victoire")
+        with span("render_chart"):
+            render_ratio_chart(st, ratios, chart_backend)
 
-    if len(ratios) + 1 <= 20:
-        xticks.update(range(2, len(ratios)))  # show all intermediate ticks
-    else:
-        xticks.update(range(5, len(ratios), 5))  # every 5th tick
-
-    ax.set_xticks(sorted(xticks))
-    ax.set_xlabel("Nombre de matchs", loc="right")
-    ax.set_ylabel(
-        "Pourcentage de\nvictoires ajusté\n[%]",
-        va="top",
-        loc="top",
-        rotation="horizontal",
-        labelpad=20,
-    )
-    ax.grid(True)
-    st.pyplot(fig)
+        st.subheader("📋 Vos matchs enregistrés")
+        st.dataframe(df)
+        st.caption(
+            "impact_ratio : effet du match sur le ratio (ratio actuel moins ratio sans ce match)."
+        )
 
-    st.subheader("📋 Vos matchs enregistrés")
-    st.dataframe(df)
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("🗑️ Supprimer le dernier match encodé"):
+                if st.session_state["matches"]:
+                    st.session_state["matches"] = st.session_state["matches"][:-1]
+                    st.success("Dernier match supprimé ✅")
+                    st.rerun()
+                else:
+                    st.warning("Aucun match à supprimer.")
 
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("🗑️ Supprimer le dernier match encodé"):
+        with col2:
+            # Exporter les matchs au format JSON
             if st.session_state["matches"]:
-                removed_match = st.session_state["matches"].pop()
-                st.success("Dernier match supprimé ✅")
-                st.rerun()
-            else:
-                st.warning("Aucun match à supprimer.")
+                json_data = json.dumps(
+                    st.session_state["matches"].to_dicts(), indent=2
+                )
+                st.download_button(
+                    "💾 Télécharger mes matchs",
+                    json_data,
+                    file_name="mes_matchs_AFT.json",
+                )
+
+        if st.button("🔁 Réinitialiser le calcul"):
+            st.session_state["matches"] = MatchTable.empty()
+            st.session_state["flag_uploaded_file"] = False
+            st.rerun()
+    else:
+        st.info(
+            "Entrez votre numéro d'affiliation ou ajoutez des matchs manuellement pour commencer le calcul."
+        )
 
-    with col2:
-        # Exporter les matchs au format JSON
-        if st.session_state["matches"]:
-            json_data = json.dumps(st.session_state["matches"], indent=2)
-            st.download_button(
-                "💾 Télécharger mes matchs", json_data, file_name="mes_matchs_AFT.json"
-            )
 
-    if st.button("🔁 Réinitialiser le calcul"):
-        st.session_state["matches"] = []
-        st.session_state["flag_uploaded_file"] = False
-        st.rerun()
-else:
-    st.info(
-        "Entrez votre numéro d'affiliation ou ajoutez des matchs manuellement pour commencer le calcul."
-    )
+results_section()
 
 
-manual_input = st.checkbox(
-    "Ajouter des matchs manuellement ou depuis un fichier JSON", value=False
-)
+# Manual entry: its widgets only rerun this part, until matches are added
+@st.fragment
+def manual_entry_section():
+    if "manual_notice" in st.session_state:
+        st.success(st.session_state.pop("manual_notice"))
 
+    manual_input = st.checkbox(
+        "Ajouter des matchs manuellement ou depuis un fichier JSON", value=False
+    )
 
-if manual_input:
 
-    uploaded_file = st.file_uploader(
-        "📂 Charger un fichier de matchs (.json)", type="json"
-    )
+    if manual_input:
 
-    if st.session_state["flag_uploaded_file"] is False and uploaded_file is not None:
-        try:
-            loaded_data = json.load(uploaded_file)
-            if isinstance(loaded_data, list) and all(
-                isinstance(match, dict) for match in loaded_data
-            ):
-                st.session_state["matches"] = st.session_state["matches"] + loaded_data
-                st.success("✅ Matchs chargés avec succès !")
-                st.session_state["flag_uploaded_file"] = True
-            else:
-                st.error("❌ Fichier invalide.")
-        except Exception as e:
-            st.error(f"❌ Erreur lors du chargement du fichier: {e}")
-
-    with st.form("match_form"):
-        st.subheader("Ajouter un match")
-
-
-        genre = st.selectbox("Genre", ["Messieurs", "Dames"])
-        category = st.selectbox(
-            "Votre classement actuel",
-            ["P50", "P100", "P200", "P300", "P400", "P500", "P700", "P1000"],
+        uploaded_file = st.file_uploader(
+            "📂 Charger un fichier de matchs (.json)", type="json"
         )
-        result = st.selectbox("Résultat", ["Victoire", "Défaite"])
-        comp_type = st.selectbox(
-            "Type de compétition", ["Tour", "Interclubs", "Mixte", "Masters"]
-        )
-        phase = st.selectbox("Phase", ["Poule", "Tableau"])
 
-        partner_rank = st.selectbox(
-            "Classement partenaire", [50] + list(range(100, 600, 100)) + [700, 1000]
-        )
+        if (
+            st.session_state["flag_uploaded_file"] is False
+            and uploaded_file is not None
+        ):
+            try:
+                # The uploaded file is already in memory: parsing it element by
+                # element only avoids decoding it as one big string
+                loaded_data = []
+                for match in iter_json_array(uploaded_file):
+                    if not isinstance(match, dict):
+                        loaded_data = None
+                        break
+                    loaded_data.append(match)
+                if loaded_data is not None:
+                    st.session_state["matches"] = st.session_state["matches"].concat(
+                        MatchTable.from_dicts(loaded_data)
+                    )
+                    st.session_state["manual_notice"] = (
+                        "✅ Matchs chargés avec succès !"
+                    )
+                    st.session_state["flag_uploaded_file"] = True
+                    # The results above depend on the new matches
+                    st.rerun()
+                else:
+                    st.error("❌ Fichier invalide.")
+            except Exception as e:
+                st.error(f"❌ Erreur lors du chargement du fichier: {e}")
 
-        col1, col2 = st.columns(2)
-        with col1:
-            opp1_rank = st.selectbox(
-                "Classement adversaire 1",
-                [50] + list(range(100, 600, 100)) + [700, 1000],
+        with st.form("match_form"):
+            st.subheader("Ajouter un match")
+
+
+            genre = st.selectbox("Genre", ["Messieurs", "Dames"])
+            category = st.selectbox(
+                "Votre classement actuel",
+                ["P50", "P100", "P200", "P300", "P400", "P500", "P700", "P1000"],
             )
-        with col2:
-            opp2_rank = st.selectbox(
-                "Classement adversaire 2",
-                [50] + list(range(100, 600, 100)) + [700, 1000],
+            result = st.selectbox("Résultat", ["Victoire", "Défaite"])
+            comp_type = st.selectbox(
+                "Type de compétition", ["Tour", "Interclubs", "Mixte", "Masters"]
             )
+            phase = st.selectbox("Phase", ["Poule", "Tableau"])
+
+            partner_rank = st.selectbox(
+                "Classement partenaire", [50] + list(range(100, 600, 100)) + [700, 1000]
+            )
+
+            col1, col2 = st.columns(2)
+            with col1:
+                opp1_rank = st.selectbox(
+                    "Classement adversaire 1",
+                    [50] + list(range(100, 600, 100)) + [700, 1000],
+                )
+            with col2:
+                opp2_rank = st.selectbox(
+                    "Classement adversaire 2",
+                    [50] + list(range(100, 600, 100)) + [700, 1000],
+                )
+
+            submitted = st.form_submit_button("Ajouter le match")
+
+            if submitted:
+                match = {
+                    "genre": genre,
+                    "resultat": result,
+                    "type_competition": comp_type,
+                    "phase": phase,
+                    "classement_joueur": int("".join(filter(str.isdigit, category))),
+                    "classement_partenaire": partner_rank,
+                    "classement_adversaire_1": opp1_rank,
+                    "classement_adversaire_2": opp2_rank,
+                    "categorie": category,
+                }
+                st.session_state["matches"] = st.session_state["matches"].concat(
+                    MatchTable.from_dicts([match])
+                )
+                st.session_state["manual_notice"] = "✅ Match ajouté avec succès !"
+                st.rerun()
 
-        submitted = st.form_submit_button("Ajouter le match")
-
-        if submitted:
-            match = {
-                "genre": genre,
-                "resultat": result,
-                "type_competition": comp_type,
-                "phase": phase,
-                "classement_joueur": float("".join(filter(str.isdigit, category))),
-                "classement_partenaire": partner_rank,
-                "classement_adversaire_1": opp1_rank,
-                "classement_adversaire_2": opp2_rank,
-                "categorie": category,
-            }
-            st.session_state["matches"] = st.session_state["matches"] + [match]
-            st.success("✅ Match ajouté avec succès !")
 
+manual_entry_section()
+
+
+if debug_mode:
+    recorder = stop_recording()
+    with st.expander("⏱️ Performance (debug)", expanded=True):
+        summary = recorder.summary()
+        st.dataframe(
+            [
+                {
+                    "étape": name,
+                    "appels": entry["calls"],
+                    "durée [ms]": round(entry["total_s"] * 1000, 2),
+                }
+                for name, entry in summary.items()
+            ]
+        )
+        if recorder.counters:
+            st.write(recorder.counters)
+        cache = get_cache()
+        cache_stats = cache.stats() if cache is not None else None
+        if cache_stats:
+            st.write("Cache TPPWB :", cache_stats)
+
+        col_json, col_prom = st.columns(2)
+        with col_json:
+            st.download_button(
+                "Exporter (JSON)", recorder.to_json(), file_name="timings.json"
+            )
+        with col_prom:
+            st.download_button(
+                "Exporter (Prometheus)",
+                to_prometheus(cache_stats),
+                file_name="metrics.prom",
+            )
 
 st.divider()
 st.caption(
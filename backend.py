@@ -1,5 +1,15 @@
 # ---------- backend.py ----------
-import pandas as pd
+# pandas is only imported by the functions that build DataFrames, so the
+# scalar helpers (get_ranking_correction, generate_recommendation) can be
+# used without paying for its import.
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, NamedTuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 PHASE_FACTORS = {
     "Poule": {"victoire": 1.0, "défaite": 1.0},
@@ -27,18 +37,68 @@ RANKING_THRESHOLDS_WOMEN = {
     "P500": {"drop": 30, "up1": 100, "up2": 100},
 }
 
+# Tables of the ranking system. Candidate rule sets replace some of them,
+# e.g. make_rules({"competition_factors": {...}}) (see parallel.py)
+DEFAULT_RULES = {
+    "phase_factors": PHASE_FACTORS,
+    "competition_factors": COMPETITION_FACTORS,
+    "thresholds_men": RANKING_THRESHOLDS_MEN,
+    "thresholds_women": RANKING_THRESHOLDS_WOMEN,
+}
 
-def get_ranking_correction(player, partner, opp1, opp2, result):
 
-    # define ranking ladder
-    RANKS = [50, 100, 200, 300, 400, 500, 700, 1000]
-    index = {r: i for i, r in enumerate(RANKS)}
+def make_rules(overrides=None) -> dict:
+    overrides = overrides or {}
+    unknown = set(overrides) - set(DEFAULT_RULES)
+    if unknown:
+        raise ValueError(f"Règles inconnues : {', '.join(sorted(unknown))}")
+    return {**DEFAULT_RULES, **overrides}
+
+
+# Seulement 12 matchs nécessaires sauf si montée de 2 classements alors 24 sont nécessaires
+REQUIRED_MATCHES = 12
+REQUIRED_MATCHES_UP2 = 24
+
+
+# Thresholds {"drop", "up1", "up2"} of a category, None if it is unknown
+def ranking_thresholds(category: str, gender: str, rules: dict | None = None):
+    rules = rules or DEFAULT_RULES
+    thresholds = (
+        rules["thresholds_women"]
+        if gender.lower() == "dames"
+        else rules["thresholds_men"]
+    )
+    return thresholds.get(category)
+
+
+# define ranking ladder
+RANKS = [50, 100, 200, 300, 400, 500, 700, 1000]
+RANK_INDEX = {r: i for i, r in enumerate(RANKS)}
+
+CORRECTION_MATRIX = {
+    -3: {-3: 1.70, -2: 1.65, -1: 1.60, 0: 1.55, 1: 1.50, 2: 1.45, 3: 1.40},
+    -2: {-3: 1.50, -2: 1.45, -1: 1.40, 0: 1.35, 1: 1.30, 2: 1.25, 3: 1.20},
+    -1: {-3: 1.40, -2: 1.35, -1: 1.30, 0: 1.25, 1: 1.20, 2: 1.15, 3: 1.10},
+    0: {-3: 1.00, -2: 1.00, -1: 1.00, 0: 1.00, 1: 1.00, 2: 1.00, 3: 1.00},
+    1: {-3: 0.85, -2: 0.80, -1: 0.75, 0: 0.70, 1: 0.65, 2: 0.60, 3: 0.55},
+    2: {-3: 0.70, -2: 0.65, -1: 0.60, 0: 0.55, 1: 0.50, 2: 0.45, 3: 0.40},
+    3: {-3: 0.45, -2: 0.40, -1: 0.35, 0: 0.30, 1: 0.25, 2: 0.20, 3: 0.15},
+}
+
+# Lookup arrays for the vectorized engine (built once at import)
+_RANKS_ARRAY = np.array(RANKS, dtype=float)
+_CORRECTION_ARRAY = np.array(
+    [[CORRECTION_MATRIX[ds][di] for di in range(-3, 4)] for ds in range(-3, 4)]
+)
+
+
+def get_ranking_correction(player, partner, opp1, opp2, result):
 
     # convert rankings to ladder indices
-    player_idx = index[player]
-    partner_idx = index[partner]
-    opp1_idx = index[opp1]
-    opp2_idx = index[opp2]
+    player_idx = RANK_INDEX[player]
+    partner_idx = RANK_INDEX[partner]
+    opp1_idx = RANK_INDEX[opp1]
+    opp2_idx = RANK_INDEX[opp2]
 
     my_sum = player_idx + partner_idx
     opp_sum = opp1_idx + opp2_idx
@@ -49,20 +109,10 @@ def get_ranking_correction(player, partner, opp1, opp2, result):
     delta_sum = max(min(int(delta_sum), 3), -3)
     delta_individual = max(min(int(delta_individual), 3), -3)
 
-    correction_matrix = {
-        -3: {-3: 1.70, -2: 1.65, -1: 1.60, 0: 1.55, 1: 1.50, 2: 1.45, 3: 1.40},
-        -2: {-3: 1.50, -2: 1.45, -1: 1.40, 0: 1.35, 1: 1.30, 2: 1.25, 3: 1.20},
-        -1: {-3: 1.40, -2: 1.35, -1: 1.30, 0: 1.25, 1: 1.20, 2: 1.15, 3: 1.10},
-        0: {-3: 1.00, -2: 1.00, -1: 1.00, 0: 1.00, 1: 1.00, 2: 1.00, 3: 1.00},
-        1: {-3: 0.85, -2: 0.80, -1: 0.75, 0: 0.70, 1: 0.65, 2: 0.60, 3: 0.55},
-        2: {-3: 0.70, -2: 0.65, -1: 0.60, 0: 0.55, 1: 0.50, 2: 0.45, 3: 0.40},
-        3: {-3: 0.45, -2: 0.40, -1: 0.35, 0: 0.30, 1: 0.25, 2: 0.20, 3: 0.15},
-    }
-
     if result == "victoire":
-        factor = correction_matrix[delta_sum][delta_individual]
+        factor = CORRECTION_MATRIX[delta_sum][delta_individual]
     else:
-        factor = correction_matrix[-delta_sum][-delta_individual]
+        factor = CORRECTION_MATRIX[-delta_sum][-delta_individual]
 
     return factor
 
@@ -102,38 +152,406 @@ def compute_win_ratio(df: pd.DataFrame) -> tuple:
     return ratio, recommendation, match_weights
 
 
-def generate_recommendation(
-    ratio: float, match_count: int, category: str, gender: str
-) -> str:
-    thresholds = (
-        RANKING_THRESHOLDS_WOMEN
-        if gender.lower() == "dames"
-        else RANKING_THRESHOLDS_MEN
+# Convert rankings (50, 100, ..., 1000) to ladder indices, all rows at once
+def ladder_indices(rankings) -> np.ndarray:
+    values = np.asarray(rankings, dtype=float)
+    idx = np.minimum(np.searchsorted(_RANKS_ARRAY, values), len(RANKS) - 1)
+    invalid = _RANKS_ARRAY[idx] != values
+    if invalid.any():
+        # Same failure as the scalar lookup in get_ranking_correction
+        raise KeyError(values[invalid][0])
+    return idx
+
+
+# Codes of the phase and competition names of the matches (in order of first
+# appearance) and the names of the codes. A missing value raises KeyError,
+# like the per-row lookups of compute_win_ratio.
+def encode_factor_names(df: pd.DataFrame) -> tuple:
+    import pandas as pd
+
+    encoded = []
+    for column in ("phase", "type_competition"):
+        codes, names = pd.factorize(df[column])
+        if (codes < 0).any():
+            raise KeyError(df[column][codes < 0].iloc[0])
+        encoded += [codes, list(names)]
+    return tuple(encoded)
+
+
+# Factor lookup arrays of a rule set, indexed by the codes of `phases` and
+# `competitions`: (phase factor if won, phase factor if lost, competition
+# factor). A name missing from the rules raises KeyError when a match uses it
+# (`phase_codes` / `competition_codes`; every name when they are not given).
+def factor_arrays(
+    rules, phases, competitions, phase_codes=None, competition_codes=None
+) -> tuple:
+    phase_factors = rules["phase_factors"]
+    competition_factors = rules["competition_factors"]
+    phase_win, phase_loss = (
+        np.array([phase_factors.get(p, {}).get(r, np.nan) for p in phases], float)
+        for r in ("victoire", "défaite")
+    )
+    competition = np.array(
+        [competition_factors.get(c, np.nan) for c in competitions], float
     )
+    for names, missing, codes in (
+        (phases, np.isnan(phase_win) | np.isnan(phase_loss), phase_codes),
+        (competitions, np.isnan(competition), competition_codes),
+    ):
+        if codes is None:
+            codes = np.arange(len(names))
+        used = missing[codes]
+        if used.any():
+            raise KeyError(names[codes[used][0]])
+    return phase_win, phase_loss, competition
 
-    # Seulement 12 matchs nécessaires sauf si montée de 2 classements alors 24 sont nécessaires
-    required_matches = 12
-    required_matches_up2 = 24
 
-    if category not in thresholds or match_count < required_matches:
-        return f"❕ Pas de recommandation (catégorie inconnue ou moins de {required_matches} matchs effectués)."
+# Vectorized equivalent of the per-row weight computation of compute_win_ratio.
+# Also accepts a matchtable.MatchTable, whose integer codes are used directly.
+def compute_match_weights(df: pd.DataFrame, rules: dict | None = None) -> tuple:
+    rules = rules or DEFAULT_RULES
+    if not hasattr(df, "iloc"):
+        return df.match_weights(rules)
+
+    results = df["resultat"].str.lower()
+    victories = (results == "victoire").to_numpy()
+    unknown = ~results.isin(["victoire", "défaite"])
+    if unknown.any():
+        raise KeyError(results[unknown].iloc[0])
+
+    phase_codes, phases, competition_codes, competitions = encode_factor_names(df)
+    phase_win, phase_loss, competition = factor_arrays(
+        rules, phases, competitions, phase_codes, competition_codes
+    )
+    phase_factor = np.where(victories, phase_win[phase_codes], phase_loss[phase_codes])
+
+    return combine_match_weights(
+        victories,
+        phase_factor,
+        competition[competition_codes],
+        ladder_indices(df["classement_joueur"]),
+        ladder_indices(df["classement_partenaire"]),
+        ladder_indices(df["classement_adversaire_1"]),
+        ladder_indices(df["classement_adversaire_2"]),
+    )
+
+
+# Weights and scores from per-match factors and ladder indices
+def combine_match_weights(
+    victories, phase_factor, comp_factor, player_idx, partner_idx, opp1_idx, opp2_idx
+) -> tuple:
+    delta_sum = np.clip((player_idx + partner_idx) - (opp1_idx + opp2_idx), -3, 3)
+    delta_individual = np.clip(player_idx - partner_idx, -3, 3)
+
+    # Defeats read the matrix with both deltas negated
+    sign = np.where(victories, 1, -1)
+    rank_factor = _CORRECTION_ARRAY[sign * delta_sum + 3, sign * delta_individual + 3]
+
+    weights = phase_factor * comp_factor * rank_factor
+    scores = np.where(victories, weights, 0.0)
+    return weights, scores
+
+
+# Category and gender of the player, from the first match
+def player_profile(df) -> tuple:
+    if hasattr(df, "iloc"):
+        ranking, gender = df["classement_joueur"].iloc[0], df["genre"].iloc[0]
+    else:
+        ranking, gender = df.player_profile()
+    return "P" + str(ranking), gender
+
+
+# Vectorized engine, returns the same values as compute_win_ratio (kept as reference)
+def compute_win_ratio_vectorized(df: pd.DataFrame) -> tuple:
+    weights, scores = compute_match_weights(df)
+
+    # Running sums add the matches in order, exactly like the reference loop
+    total_points = np.cumsum(scores)[-1] if len(scores) else 0
+    total_weights = np.cumsum(weights)[-1] if len(weights) else 0
+
+    if total_weights == 0:
+        return 0.0, "Pas de matchs valides."
+
+    ratio = round(float(total_points / total_weights) * 100, 2)
+    category, gender = player_profile(df)
+    recommendation = generate_recommendation(ratio, len(df), category, gender)
+    return ratio, recommendation, weights.tolist()
+
+
+# Ratios in percent rounded to 2 decimals, 0.0 where the weight is 0 (no
+# valid match)
+def _round_ratios(points, weights) -> list:
+    weights = np.asarray(weights)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        raw_ratios = (np.asarray(points) / weights) * 100
+    return [round(float(r), 2) if w != 0 else 0.0 for r, w in zip(raw_ratios, weights)]
+
+
+# Ratio after each match (cumulative), in a single pass over running sums.
+# Element i equals the ratio of compute_win_ratio(df.iloc[: i + 1]).
+def compute_ratio_curve(df: pd.DataFrame, with_recommendations: bool = False):
+    weights, scores = compute_match_weights(df)
+    cum_points = np.cumsum(scores)
+    cum_weights = np.cumsum(weights)
+
+    ratios = _round_ratios(cum_points, cum_weights)
+
+    if not with_recommendations:
+        return ratios
+
+    if len(df) == 0:
+        return ratios, []
+    category, gender = player_profile(df)
+    recommendations = [
+        generate_recommendation(ratio, count, category, gender)
+        for count, ratio in enumerate(ratios, start=1)
+    ]
+    return ratios, recommendations
+
+
+# Leave-one-out ratios: the ratio of the player without each match, from the
+# totals of all their matches (arrays broadcast to the matches). A match
+# alone leaves no valid match, its ratio without it is 0.0.
+def leave_one_out_ratios(total_points, total_weights, scores, weights) -> list:
+    return _round_ratios(total_points - scores, total_weights - weights)
+
+
+# Recommendation of each ratio. The text only depends on the band of the
+# ratio between the thresholds (drop, up1, up2), so it is computed once per
+# band, match count, category and gender. No match left: no valid matches.
+def _recommendations(ratios, match_counts, categories, genders, rules=None) -> list:
+    ratios = np.asarray(ratios, dtype=float)
+    limits = {}
+    for category, gender in set(zip(categories, genders)):
+        limit = ranking_thresholds(category, gender, rules) or {}
+        limits[category, gender] = [
+            limit.get(name, np.nan) for name in ("drop", "up1", "up2")
+        ]
+    profiles = {profile: i for i, profile in enumerate(limits)}
+    profile_codes = np.array(
+        [profiles[profile] for profile in zip(categories, genders)], dtype=np.int64
+    )
+    drop, up1, up2 = np.array(list(limits.values()), dtype=float).reshape(-1, 3).T[
+        :, profile_codes
+    ]
+    bands = np.select(
+        [ratios < drop, (up2 < 100) & (ratios > up2), ratios > up1], [0, 3, 2], 1
+    )
+
+    counts = np.asarray(match_counts, dtype=np.int64)
+    keys = (profile_codes * 4 + bands) * (counts.max(initial=0) + 1) + counts
+    _, firsts, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    texts = np.empty(len(firsts), dtype=object)
+    for i, row in enumerate(firsts.tolist()):
+        count = int(counts[row])
+        texts[i] = (
+            generate_recommendation(
+                float(ratios[row]), count, categories[row], genders[row], rules
+            )
+            if count
+            else "Pas de matchs valides."
+        )
+    return texts[inverse.reshape(-1)].tolist()
+
+
+# Impact of each match on the final ratio, in a single pass over the totals:
+# impacts[i] is the ratio minus the ratio without match i (what the player
+# would get from compute_win_ratio on the other matches), together with the
+# ratios and recommendations without each match.
+def compute_match_impacts(df: pd.DataFrame, rules: dict | None = None) -> tuple:
+    weights, scores = compute_match_weights(df, rules)
+    if len(weights) == 0:
+        return [], [], []
+    total_points = np.cumsum(scores)[-1]
+    total_weights = np.cumsum(weights)[-1]
+    ratio = (
+        round(float(total_points / total_weights) * 100, 2) if total_weights else 0.0
+    )
+
+    ratios_without = leave_one_out_ratios(total_points, total_weights, scores, weights)
+    # Differences of values with 2 decimals: no tie for the rounding
+    impacts = np.round(ratio - np.array(ratios_without), 2).tolist()
+    category, gender = player_profile(df)
+    n = len(ratios_without)
+    recommendations_without = _recommendations(
+        ratios_without, [n - 1] * n, [category] * n, [gender] * n, rules
+    )
+    return impacts, ratios_without, recommendations_without
+
+
+# Totals of every player of a long match table, see player_totals
+class PlayerTotals(NamedTuple):
+    matches: pd.DataFrame  # the matches with a key, in their order
+    codes: np.ndarray  # player of each match
+    players: pd.Index  # numbered by first appearance
+    weights: np.ndarray  # of each match
+    scores: np.ndarray  # of each match
+    total_points: np.ndarray  # of each player
+    total_weights: np.ndarray
+    match_counts: np.ndarray
+    first_rows: pd.DataFrame  # first match of each player
+
+
+# Totals of every player of a long match table keyed by `key`, the matches
+# without key being left out
+def player_totals(
+    df: pd.DataFrame, key: str = "numero_affiliation", rules: dict | None = None
+) -> PlayerTotals:
+    import pandas as pd
+
+    df = df[df[key].notna()]
+    weights, scores = compute_match_weights(df, rules)
+    codes, players = pd.factorize(df[key])
+    n_players = len(players)
+
+    # np.add.at adds the matches in row order, like the single-player loop
+    total_points = np.zeros(n_players)
+    total_weights = np.zeros(n_players)
+    np.add.at(total_points, codes, scores)
+    np.add.at(total_weights, codes, weights)
+    match_counts = np.bincount(codes, minlength=n_players)
+
+    # Players are numbered by first appearance, so their first rows are in order
+    first_rows = df.groupby(codes, sort=False).head(1)
+    return PlayerTotals(
+        df,
+        codes,
+        players,
+        weights,
+        scores,
+        total_points,
+        total_weights,
+        match_counts,
+        first_rows,
+    )
+
+
+# Federation-wide mode: one long table of matches keyed by affiliation number.
+# Returns one row per player with the same values as compute_win_ratio.
+def compute_win_ratio_batch(
+    df: pd.DataFrame, key: str = "numero_affiliation", rules: dict | None = None
+) -> pd.DataFrame:
+    # Matches without affiliation number cannot be attributed to a player
+    totals = player_totals(df, key, rules)
+    categories = ["P" + str(r) for r in totals.first_rows["classement_joueur"]]
+    genders = totals.first_rows["genre"].tolist()
+    return summarize_players(
+        totals.players,
+        totals.total_points,
+        totals.total_weights,
+        totals.match_counts,
+        categories,
+        genders,
+        key,
+        rules,
+    )
+
+
+# Batch equivalent of compute_match_impacts: the matches with their player's
+# ratio without each of them, its impact and the recommendation without it
+def compute_match_impacts_batch(
+    df: pd.DataFrame, key: str = "numero_affiliation", rules: dict | None = None
+) -> pd.DataFrame:
+    totals = player_totals(df, key, rules)
+    codes = totals.codes
+    first_rows = totals.first_rows
+    categories = np.array(["P" + str(r) for r in first_rows["classement_joueur"]])
+    genders = first_rows["genre"].to_numpy()
+    ratios = _round_ratios(totals.total_points, totals.total_weights)
+
+    ratios_without = leave_one_out_ratios(
+        totals.total_points[codes],
+        totals.total_weights[codes],
+        totals.scores,
+        totals.weights,
+    )
+    impacts = np.round(np.array(ratios)[codes] - np.array(ratios_without), 2)
+    recommendations_without = _recommendations(
+        ratios_without,
+        (totals.match_counts[codes] - 1).tolist(),
+        categories[codes].tolist(),
+        genders[codes].tolist(),
+        rules,
+    )
+    return totals.matches.assign(
+        ratio_sans_ce_match=ratios_without,
+        impact_ratio=impacts.tolist(),
+        recommandation_sans_ce_match=recommendations_without,
+    )
+
+
+# Build the per-player results table of the batch mode from accumulated totals
+def summarize_players(
+    players,
+    total_points,
+    total_weights,
+    match_counts,
+    categories,
+    genders,
+    key,
+    rules=None,
+) -> pd.DataFrame:
+    import pandas as pd
+
+    ratios, recommendations = recommend_players(
+        total_points, total_weights, match_counts, categories, genders, rules
+    )
+    return pd.DataFrame(
+        {
+            key: players,
+            "ratio": ratios,
+            "nombre_matchs": match_counts,
+            "categorie": categories,
+            "genre": genders,
+            "recommandation": recommendations,
+        }
+    )
+
+
+# Ratio and recommendation of each player from accumulated totals
+def recommend_players(
+    total_points, total_weights, match_counts, categories, genders, rules=None
+) -> tuple:
+    ratios = _round_ratios(total_points, total_weights)
+    recommendations = [
+        (
+            generate_recommendation(ratio, int(count), category, gender, rules)
+            if weight != 0
+            else "Pas de matchs valides."
+        )
+        for ratio, weight, count, category, gender in zip(
+            ratios, total_weights, match_counts, categories, genders
+        )
+    ]
+    return ratios, recommendations
+
+
+def generate_recommendation(
+    ratio: float,
+    match_count: int,
+    category: str,
+    gender: str,
+    rules: dict | None = None,
+) -> str:
+    limits = ranking_thresholds(category, gender, rules)
+    if limits is None or match_count < REQUIRED_MATCHES:
+        return f"❕ Pas de recommandation (catégorie inconnue ou moins de {REQUIRED_MATCHES} matchs effectués)."
 
-    limits = thresholds[category]
     if ratio < limits["drop"]:
         return f"\U0001f7e5 Descente recommandée, le ratio est inférieur au seuil de {limits['drop']}%"
 
     elif (
         limits["up2"] < 100
         and ratio > limits["up2"]
-        and match_count >= required_matches_up2
+        and match_count >= REQUIRED_MATCHES_UP2
     ):
         return f"\U0001f7e9 Vous pouvez monter de 2 niveaux, le seuil requis de {limits['up2']}% a été atteint"
     elif (
         limits["up2"] < 100
         and ratio > limits["up2"]
-        and match_count < required_matches_up2
+        and match_count < REQUIRED_MATCHES_UP2
     ):
-        return f"\U0001f7e9 Le seuil requis de {limits['up2']}% a été atteint mais le nombre de matchs est inférieur à {required_matches_up2}, ce qui est insuffisant pour monter de deux niveaux. Montée de 1 niveau possible."
+        return f"\U0001f7e9 Le seuil requis de {limits['up2']}% a été atteint mais le nombre de matchs est inférieur à {REQUIRED_MATCHES_UP2}, ce qui est insuffisant pour monter de deux niveaux. Montée de 1 niveau possible."
 
     elif ratio > limits["up1"]:
         return f"\U0001f7e9 Vous pouvez monter de 1 niveau, le seuil requis de {limits['up1']}% a été atteint"
@@ -0,0 +1,133 @@
+# ---------- batch.py ----------
+# Recompute ratio and recommendation for every player of a long match table
+# Usage: python batch.py matches.parquet results.csv [--key numero_affiliation]
+#        [--workers 8] [--rules candidate_rules.json] [--impacts impacts.csv]
+# The rules file maps a name to overrides of backend.DEFAULT_RULES, e.g.
+# {"actuel": {}, "mixte_0.9": {"competition_factors": {"Tour": 1.0, ...}}}
+# --impacts also writes every match with its impact on the player's ratio
+# (see backend.compute_match_impacts_batch).
+import argparse
+import json
+import os
+
+import pandas as pd
+
+from backend import compute_match_impacts_batch, compute_win_ratio_batch, make_rules
+
+
+def read_matches(path, key="numero_affiliation"):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        # Keep affiliation numbers as text (leading zeros)
+        return pd.read_csv(path, dtype={key: str})
+    if extension == ".json":
+        return pd.read_json(path, dtype={key: str})
+    if extension in (".parquet", ".pq"):
+        return pd.read_parquet(path)
+    raise ValueError(f"Format de fichier non supporté : {path}")
+
+
+def write_results(results, path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        results.to_csv(path, index=False)
+    elif extension == ".json":
+        results.to_json(path, orient="records", indent=2, force_ascii=False)
+    elif extension in (".parquet", ".pq"):
+        results.to_parquet(path, index=False)
+    else:
+        raise ValueError(f"Format de fichier non supporté : {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Calcul du ratio de victoire pour tous les joueurs d'un fichier de matchs"
+    )
+    parser.add_argument(
+        "input",
+        help="Fichier de matchs (.csv, .json ou .parquet) ou dossier de la base Parquet",
+    )
+    parser.add_argument("output", help="Fichier de résultats (.csv, .json ou .parquet)")
+    parser.add_argument(
+        "--key",
+        default="numero_affiliation",
+        help="Colonne contenant le numéro d'affiliation du joueur",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Nombre de processus (0 = tous les cœurs)",
+    )
+    parser.add_argument(
+        "--rules",
+        help="Fichier JSON de jeux de règles candidats à comparer (nom -> règles)",
+    )
+    parser.add_argument(
+        "--impacts",
+        help="Fichier des matchs avec l'impact de chacun sur le ratio du joueur",
+    )
+    args = parser.parse_args(argv)
+
+    if args.rules or args.workers != 1:
+        results = compute_parallel(args)
+    elif os.path.isdir(args.input):
+        # Parquet match store written by storage.write_matches
+        from storage import compute_win_ratio_from_store
+
+        results = compute_win_ratio_from_store(args.input, key=args.key)
+    else:
+        matches = read_matches(args.input, args.key)
+        results = compute_win_ratio_batch(matches, key=args.key)
+    write_results(results, args.output)
+    if args.rules:
+        # One row per player and rule set
+        n_rule_sets = results["regles"].nunique()
+        results = results[results["regles"] == results["regles"].iloc[0]]
+        print(f"{n_rule_sets} jeux de règles comparés")
+    print(
+        f"{len(results)} joueurs calculés ({results['nombre_matchs'].sum()} matchs)"
+        f" -> {args.output}"
+    )
+    if args.impacts:
+        impacts = compute_match_impacts_batch(load_matches(args), key=args.key)
+        write_results(impacts, args.impacts)
+        print(f"{len(impacts)} matchs avec leur impact -> {args.impacts}")
+
+
+def load_matches(args):
+    if os.path.isdir(args.input):
+        from storage import read_matches as read_store
+
+        return read_store(args.input)
+    return read_matches(args.input, args.key)
+
+
+def print_progress(done, total, start, end):
+    print(f"[{done}/{total}] joueurs {start} à {end - 1} calculés", flush=True)
+
+
+# Sharded computation on several processes (see parallel.py)
+def compute_parallel(args):
+    from parallel import compare_rule_sets, compute_win_ratio_parallel
+
+    matches = load_matches(args)
+    workers = args.workers or None
+    if not args.rules:
+        return compute_win_ratio_parallel(
+            matches, key=args.key, workers=workers, progress=print_progress
+        )
+
+    with open(args.rules, encoding="utf-8") as f:
+        rule_sets = {name: make_rules(rules) for name, rules in json.load(f).items()}
+    results = compare_rule_sets(
+        matches, rule_sets, key=args.key, workers=workers, progress=print_progress
+    )
+    # One table, the rule set name in the first column
+    return pd.concat(
+        [r.assign(regles=name) for name, r in results.items()], ignore_index=True
+    )[["regles", *next(iter(results.values())).columns]]
+
+
+if __name__ == "__main__":
+    main()
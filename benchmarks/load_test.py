@@ -0,0 +1,282 @@
+# ---------- benchmarks/load_test.py ----------
+# Load test of the page path with many concurrent users: each simulated user
+# loads affiliation numbers one after the other, like the app does on submit:
+#   fetch   - player info and results from the TPPWB API (tppwb.py)
+#   compute - ratio, recommendation, curve, impacts and table of matches
+#             (compute_results)
+#   render  - serialization of what the page sends to the browser (the table
+#             of matches as Arrow, like st.dataframe, and the chart spec)
+# By default the API is a local stand-in (mock_tppwb.py) started in-process;
+# --base-url targets another server. Latency percentiles and throughput are
+# reported per stage and for the whole page.
+# Usage:
+#   python benchmarks/load_test.py --users 50 --duration 30 --latency-ms 80 --error-rate 0.02
+#   python benchmarks/load_test.py --base-url http://127.0.0.1:8503 --output load.json
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import numpy as np  # noqa: E402
+import pyarrow as pa  # noqa: E402
+
+from backend import (  # noqa: E402
+    compute_match_impacts,
+    compute_ratio_curve,
+    compute_win_ratio_vectorized,
+)
+from cache import ResponseCache, set_cache  # noqa: E402
+from charts import ratio_chart_spec  # noqa: E402
+from matchtable import MatchTable  # noqa: E402
+from mock_tppwb import MockTppwbServer  # noqa: E402
+from tppwb import (  # noqa: E402
+    TppwbClient,
+    tppwb_matches_streaming,
+    tppwb_player_info,
+)
+
+STAGES = ("fetch", "compute", "render", "page")
+PERCENTILES = (50, 90, 99)
+
+
+def fetch(affiliation_number, client):
+    player_info = tppwb_player_info(affiliation_number, client=client)
+    # Same fetch path as the app
+    matches, category_change, date_from = tppwb_matches_streaming(
+        affiliation_number, client=client
+    )
+    return player_info, matches
+
+
+# Same work as compute_results in app.py
+def compute(matches):
+    table = MatchTable.from_dicts(matches)
+    if len(table) == 0:
+        return None
+    win_ratio, recommendation, match_weights = compute_win_ratio_vectorized(table)
+    ratios = compute_ratio_curve(table)
+    df = table.to_frame()
+    df["coefficient_total"] = match_weights
+    impacts, _, recommendations_without = compute_match_impacts(table)
+    df["impact_ratio"] = impacts
+    df["recommandation_sans_ce_match"] = [
+        r if r != recommendation else "" for r in recommendations_without
+    ]
+    return df, win_ratio, recommendation, ratios
+
+
+def render(player_info, results):
+    payload = [json.dumps(player_info).encode("utf-8")]
+    if results is not None:
+        df, win_ratio, recommendation, ratios = results
+        sink = pa.BufferOutputStream()
+        table = pa.Table.from_pandas(df)
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        payload.append(sink.getvalue().to_pybytes())
+        payload.append(json.dumps(ratio_chart_spec(ratios)).encode("utf-8"))
+    return sum(len(p) for p in payload)
+
+
+# One simulated user: pages loaded until the deadline. Durations are appended
+# to timings[stage], error messages to errors[stage].
+def run_user(client, players, deadline, think_time, seed, timings, errors):
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        affiliation_number = rng.choice(players)
+        page_start = time.perf_counter()
+        stage = "fetch"
+        try:
+            start = time.perf_counter()
+            player_info, matches = fetch(affiliation_number, client)
+            timings["fetch"].append(time.perf_counter() - start)
+
+            stage = "compute"
+            start = time.perf_counter()
+            results = compute(matches)
+            timings["compute"].append(time.perf_counter() - start)
+
+            stage = "render"
+            start = time.perf_counter()
+            render(player_info, results)
+            timings["render"].append(time.perf_counter() - start)
+            timings["page"].append(time.perf_counter() - page_start)
+        except Exception as e:
+            errors[stage].append(f"{type(e).__name__}: {e}")
+        if think_time:
+            time.sleep(rng.expovariate(1 / think_time))
+
+
+def summarize(timings, errors, elapsed):
+    report = {}
+    for stage in STAGES:
+        durations = np.array(timings[stage])
+        entry = {
+            "count": len(durations),
+            "errors": len(errors.get(stage, [])),
+            "throughput_per_s": len(durations) / elapsed if elapsed else 0.0,
+        }
+        if len(durations):
+            for p, value in zip(PERCENTILES, np.percentile(durations, PERCENTILES)):
+                entry[f"p{p}_ms"] = float(value) * 1000
+            entry["max_ms"] = float(durations.max()) * 1000
+        report[stage] = entry
+    return report
+
+
+def run(
+    users=20,
+    duration=10.0,
+    players=500,
+    base_url=None,
+    latency=0.0,
+    jitter=0.0,
+    error_rate=0.0,
+    drop_rate=0.0,
+    synthetic=50,
+    think_time=0.0,
+    use_cache=False,
+    seed=0,
+):
+    server = None
+    if base_url is None:
+        server = MockTppwbServer(
+            latency=latency,
+            jitter=jitter,
+            error_rate=error_rate,
+            drop_rate=drop_rate,
+            synthetic=synthetic,
+            seed=seed,
+        ).start()
+        base_url = server.url
+
+    # Own response cache: mock results must not end up in the app's cache
+    tmp = tempfile.TemporaryDirectory(prefix="aft_load_")
+    set_cache(
+        ResponseCache(os.path.join(tmp.name, "cache.sqlite3")) if use_cache else None
+    )
+    client = TppwbClient(base_url=base_url, pool_size=users, backoff=0.05)
+    affiliation_numbers = [str(1000000 + i) for i in range(players)]
+
+    timings = {stage: [] for stage in STAGES}
+    errors = {stage: [] for stage in STAGES}
+    start = time.perf_counter()
+    deadline = start + duration
+    threads = [
+        threading.Thread(
+            target=run_user,
+            args=(
+                client,
+                affiliation_numbers,
+                deadline,
+                think_time,
+                seed + i,
+                timings,
+                errors,
+            ),
+        )
+        for i in range(users)
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        elapsed = time.perf_counter() - start
+        client.close()
+        set_cache(None)
+        tmp.cleanup()
+        if server is not None:
+            server.stop()
+
+    return {
+        "users": users,
+        "duration_s": elapsed,
+        "base_url": base_url,
+        "mock": server.counters if server is not None else None,
+        "stages": summarize(timings, errors, elapsed),
+        "error_samples": {s: e[:3] for s, e in errors.items() if e},
+    }
+
+
+def print_report(report):
+    print(f"{report['users']} utilisateurs pendant {report['duration_s']:.1f} s")
+    print(
+        f"{'étape':<8} {'nombre':>7} {'erreurs':>7} {'par s':>8}"
+        + "".join(f" {f'p{p} ms':>9}" for p in PERCENTILES)
+        + f" {'max ms':>9}"
+    )
+    for stage, entry in report["stages"].items():
+        print(
+            f"{stage:<8} {entry['count']:>7} {entry['errors']:>7}"
+            f" {entry['throughput_per_s']:>8.1f}"
+            + "".join(f" {entry.get(f'p{p}_ms', 0.0):>9.1f}" for p in PERCENTILES)
+            + f" {entry.get('max_ms', 0.0):>9.1f}"
+        )
+    if report["mock"]:
+        print("TPPWB de test :", report["mock"])
+    for stage, samples in report["error_samples"].items():
+        print(f"Erreurs ({stage}) :", samples[0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test de charge du calculateur")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="Secondes")
+    parser.add_argument(
+        "--players", type=int, default=500, help="Numéros d'affiliation différents"
+    )
+    parser.add_argument(
+        "--base-url", help="API à tester (par défaut un TPPWB de test local)"
+    )
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        default=50,
+        help="Joueurs synthétiques du TPPWB de test, en plus des fixtures",
+    )
+    parser.add_argument(
+        "--think-time", type=float, default=0.0, help="Pause moyenne entre deux pages (s)"
+    )
+    parser.add_argument(
+        "--cache", action="store_true", help="Utiliser un cache des réponses TPPWB"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Fichier JSON du rapport")
+    args = parser.parse_args(argv)
+
+    report = run(
+        users=args.users,
+        duration=args.duration,
+        players=args.players,
+        base_url=args.base_url,
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        error_rate=args.error_rate,
+        drop_rate=args.drop_rate,
+        synthetic=args.synthetic,
+        think_time=args.think_time,
+        use_cache=args.cache,
+        seed=args.seed,
+    )
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
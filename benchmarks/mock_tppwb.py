@@ -0,0 +1,224 @@
+# ---------- benchmarks/mock_tppwb.py ----------
+# Local stand-in for the TPPWB API, for load tests without calling
+# padel-webapi.tppwb.be. It answers GetResultsByPlayer with the recorded
+# fixtures (benchmarks/fixtures) or with synthetic results, and
+# SearchPlayerForAutoComplete with a player built from the same data.
+# The payload of a player only depends on its affiliation number.
+# Latency and error rates are configurable; errors are 503 (retried by
+# tppwb.TppwbClient) or dropped connections.
+# Usage:
+#   python benchmarks/mock_tppwb.py --port 8503 --latency-ms 80 --error-rate 0.02
+#   TPPWB_BASE_URL=http://127.0.0.1:8503 TPPWB_CACHE_PATH=/tmp/mock_cache.sqlite3 streamlit run app.py
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from synthetic import generate_raw_results  # noqa: E402
+
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+
+RESULTS_PATH = "/api/Players/GetResultsByPlayer"
+PLAYER_INFO_PATH = "/api/Players/SearchPlayerForAutoComplete"
+
+
+def load_payloads(fixtures_dir=FIXTURES_DIR, synthetic=0):
+    payloads = []
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, "results_*.json"))):
+        with open(path, encoding="utf-8") as f:
+            payloads.append(json.load(f))
+    # Synthetic players of 15 to 110 matches, like the fixtures
+    for seed in range(synthetic):
+        payloads.append(
+            generate_raw_results(15 + seed * 7 % 96, seed=seed, women=seed % 3 == 0)
+        )
+    return [json.dumps(p).encode("utf-8") for p in payloads], payloads
+
+
+def _player_ranking(results):
+    for record in results:
+        try:
+            return int(record["DoublePairValue"]) - int(record["PartnerDoubleValue"])
+        except (KeyError, TypeError, ValueError):
+            continue
+    return 100
+
+
+class MockTppwbHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockTPPWB"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        server.count("requests")
+
+        delay = server.delay()
+        if delay:
+            time.sleep(delay)
+        outcome = server.outcome()
+        if outcome == "drop":
+            server.count("dropped")
+            self.close_connection = True
+            return
+        if outcome == "error":
+            server.count("errors")
+            self._send(503, b'{"Message": "Service indisponible (mock)"}')
+            return
+
+        if url.path == RESULTS_PATH:
+            body = server.results_body(params.get("affiliationNumber", ""))
+        elif url.path == PLAYER_INFO_PATH:
+            body = server.player_info_body(params.get("searchText", ""))
+        else:
+            self._send(404, b'{"Message": "Not found"}')
+            return
+        self._send(200, body)
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockTppwbServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    # latency: fixed delay in seconds, plus an exponential jitter of mean
+    # `jitter`. error_rate and drop_rate are fractions of the requests.
+    def __init__(
+        self,
+        address=("127.0.0.1", 0),
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        drop_rate=0.0,
+        synthetic=0,
+        seed=0,
+    ):
+        super().__init__(address, MockTppwbHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.bodies, self.payloads = load_payloads(synthetic=synthetic)
+        if not self.bodies:
+            self.bodies, self.payloads = load_payloads(synthetic=8)
+        self.counters = {"requests": 0, "errors": 0, "dropped": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def delay(self):
+        with self._lock:
+            jitter = self._random.expovariate(1 / self.jitter) if self.jitter else 0.0
+        return self.latency + jitter
+
+    def outcome(self):
+        with self._lock:
+            draw = self._random.random()
+        if draw < self.drop_rate:
+            return "drop"
+        if draw < self.drop_rate + self.error_rate:
+            return "error"
+        return "ok"
+
+    def _payload_index(self, affiliation_number):
+        digits = "".join(c for c in str(affiliation_number) if c.isdigit())
+        return int(digits or 0) % len(self.bodies)
+
+    def results_body(self, affiliation_number):
+        return self.bodies[self._payload_index(affiliation_number)]
+
+    def player_info_body(self, affiliation_number):
+        results = self.payloads[self._payload_index(affiliation_number)]
+        info = {
+            "Nom": f"Joueur {affiliation_number}",
+            "Prenom": "Test",
+            "ClasmtDouble": f"P{_player_ranking(results)}",
+        }
+        return json.dumps([info]).encode("utf-8")
+
+    # Serve from a background thread (e.g. inside the load test)
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur TPPWB de test (fixtures)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8503)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument(
+        "--jitter-ms", type=float, default=0.0, help="Moyenne du délai aléatoire"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Part de réponses 503"
+    )
+    parser.add_argument(
+        "--drop-rate", type=float, default=0.0, help="Part de connexions coupées"
+    )
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        default=0,
+        help="Joueurs synthétiques ajoutés aux fixtures",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    server = MockTppwbServer(
+        (args.host, args.port),
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        error_rate=args.error_rate,
+        drop_rate=args.drop_rate,
+        synthetic=args.synthetic,
+        seed=args.seed,
+    )
+    print(
+        f"TPPWB de test sur {server.url} ({len(server.bodies)} joueurs types)",
+        flush=True,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# ---------- benchmarks/record_fixture.py ----------
+# Record a GetResultsByPlayer payload as a benchmark fixture.
+# Only the fields used by the normalization are kept, so clubs and the
+# player's own identity are dropped. The affiliation numbers and names of
+# partners and opponents are replaced by pseudonyms, the same person keeping
+# the same pseudonym within the payload.
+# Usage: python benchmarks/record_fixture.py 1234567 fixtures/results_xxx.json
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datetime  # noqa: E402
+
+from tppwb import (  # noqa: E402
+    IDENTITY_FIELDS,
+    previous_semester_start,
+    tppwb_raw_data,
+)
+
+KEPT_FIELDS = (
+    "Date",
+    "Category",
+    "VictoryOrDefeat",
+    "Score",
+    "DrawType",
+    "TypeTab",
+    "DoublePairValue",
+    "PartnerDoubleValue",
+    "OpponentDoubleValue1",
+    "OpponentDoubleValue2",
+)
+
+# (affiliation number, name) raw fields of the partner and the opponents
+IDENTITY_PAIRS = [
+    (IDENTITY_FIELDS[f"affiliation_{who}"], IDENTITY_FIELDS[f"nom_{who}"])
+    for who in ("partenaire", "adversaire_1", "adversaire_2")
+]
+
+
+def anonymize(records):
+    pseudonyms = {}
+    anonymized = []
+    for record in records:
+        kept = {field: record[field] for field in KEPT_FIELDS if field in record}
+        for number_field, name_field in IDENTITY_PAIRS:
+            number = record.get(number_field)
+            # Missing or empty identities stay missing or empty
+            if number is None or number == "":
+                kept.update(
+                    {f: record[f] for f in (number_field, name_field) if f in record}
+                )
+                continue
+            pseudonym = pseudonyms.setdefault(str(number), 9000000 + len(pseudonyms))
+            kept[number_field] = str(pseudonym)
+            if name_field in record:
+                kept[name_field] = f"Joueur {pseudonym}"
+        anonymized.append(kept)
+    return anonymized
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Enregistre un payload TPPWB anonymisé"
+    )
+    parser.add_argument("affiliation_number")
+    parser.add_argument("output")
+    args = parser.parse_args(argv)
+
+    date_from = previous_semester_start(datetime.date.today())
+    records = tppwb_raw_data(args.affiliation_number, date_from)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(anonymize(records), f, indent=1)
+    print(f"{len(records)} résultats -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+# ---------- benchmarks/run.py ----------
+# Benchmark suite of the hot paths: match weights, ratio curve, batch mode,
+# normalization of TPPWB payloads, recommendations, scenarios and cold start
+# imports.
+# Usage:
+#   python benchmarks/run.py --output bench.json
+#   python benchmarks/run.py --quick --compare bench.json  (exit code 1 on regression)
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import numpy as np  # noqa: E402
+
+from backend import (  # noqa: E402
+    compute_match_impacts,
+    compute_match_impacts_batch,
+    compute_match_weights,
+    compute_ratio_curve,
+    compute_win_ratio,
+    compute_win_ratio_batch,
+    compute_win_ratio_vectorized,
+    generate_recommendation,
+)
+from matchtable import MatchTable  # noqa: E402
+from scenarios import solve_scenarios_batch  # noqa: E402
+from synthetic import (  # noqa: E402
+    COMPETITIONS,
+    RANKS,
+    generate_matches,
+    generate_raw_results,
+)
+from tppwb import normalize_tppwb_data  # noqa: E402
+from tppwb_columnar import normalize_tppwb_bodies  # noqa: E402
+
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+# Cold start: fresh interpreter importing the modules loaded by the app
+COLD_IMPORTS = {
+    "backend": "import backend",
+    "app_modules": "import backend, cache, charts, streaming, timing, tppwb",
+}
+
+
+def fixture_paths():
+    return {
+        os.path.splitext(os.path.basename(path))[0]: path
+        for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.json")))
+    }
+
+
+def load_fixture(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Best and median wall time of `repeat` runs (after one warm-up run)
+def measure(function, repeat):
+    function()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), statistics.median(timings)
+
+
+def cold_import(statement):
+    subprocess.run([sys.executable, "-c", statement], cwd=REPO_DIR, check=True)
+
+
+# Datasets of the benchmarks by name, each built on first use so that --only
+# only builds the data of the selected cases
+class Datasets(dict):
+    def __init__(self, builders):
+        super().__init__()
+        self.builders = builders
+
+    def __missing__(self, name):
+        value = self[name] = self.builders[name](self)
+        return value
+
+
+def _future_matches(data):
+    rng = np.random.default_rng(6)
+    return [
+        {
+            "type_competition": str(rng.choice(COMPETITIONS[:3])),
+            "phase": str(rng.choice(["Poule", "Tableau"])),
+            "classement_partenaire": int(rng.choice(RANKS[1:])),
+            "classement_adversaire_1": int(rng.choice(RANKS[1:])),
+            "classement_adversaire_2": int(rng.choice(RANKS[1:])),
+        }
+        for _ in range(24)
+    ]
+
+
+def _recommendation_inputs(data):
+    rng = np.random.default_rng(7)
+    return list(
+        zip(
+            rng.uniform(0, 100, 10000).round(2).tolist(),
+            rng.integers(0, 40, 10000).tolist(),
+            rng.choice(["P50", "P100", "P200", "P300", "P500", "P1000"], 10000),
+            rng.choice(["Dames", "Messieurs"], 10000),
+        )
+    )
+
+
+def dataset_builders(quick):
+    scale = 10 if quick else 1
+    builders = {
+        "single": lambda data: generate_matches(1, 40, seed=1),
+        "heavy": lambda data: generate_matches(1, 120, seed=2),
+        "club": lambda data: generate_matches(200, 40, seed=3),
+        "federation": lambda data: generate_matches(25000 // scale, 40, seed=4),
+        "raw_bulk": lambda data: generate_raw_results(100000 // scale, seed=5),
+        # Response bodies of a bulk fetch: players of 15 to 110 matches
+        "bulk_bodies": lambda data: {
+            str(1000000 + i): json.dumps(
+                generate_raw_results(15 + i * 7 % 96, seed=i)
+            ).encode("utf-8")
+            for i in range(2000 // scale)
+        },
+        "heavy_table": lambda data: MatchTable.from_dicts(
+            normalize_tppwb_data(data["raw_bulk"][:120])
+        ),
+        "future_matches": _future_matches,
+        "recommendation_inputs": _recommendation_inputs,
+    }
+    for name, path in fixture_paths().items():
+        builders[f"fixture:{name}"] = lambda data, p=path: load_fixture(p)
+    return builders
+
+
+# (name, dataset, input, function): function(data) is timed and rows is the
+# length of data[input] (1 without input)
+def benchmark_cases():
+    cases = [
+        (
+            "win_ratio_reference",
+            "single",
+            "single",
+            lambda d: compute_win_ratio(d["single"]),
+        ),
+        ("win_ratio_reference", "club", "club", lambda d: compute_win_ratio(d["club"])),
+        (
+            "win_ratio_vectorized",
+            "single",
+            "single",
+            lambda d: compute_win_ratio_vectorized(d["single"]),
+        ),
+        (
+            "win_ratio_vectorized",
+            "club",
+            "club",
+            lambda d: compute_win_ratio_vectorized(d["club"]),
+        ),
+        (
+            "match_weights",
+            "federation",
+            "federation",
+            lambda d: compute_match_weights(d["federation"]),
+        ),
+        (
+            "win_ratio_matchtable",
+            "heavy",
+            "heavy_table",
+            lambda d: compute_win_ratio_vectorized(d["heavy_table"]),
+        ),
+        ("ratio_curve", "heavy", "heavy", lambda d: compute_ratio_curve(d["heavy"])),
+        (
+            "ratio_curve_recommendations",
+            "heavy",
+            "heavy",
+            lambda d: compute_ratio_curve(d["heavy"], with_recommendations=True),
+        ),
+        (
+            "match_impacts",
+            "heavy",
+            "heavy",
+            lambda d: compute_match_impacts(d["heavy"]),
+        ),
+        (
+            "match_impacts_batch",
+            "club",
+            "club",
+            lambda d: compute_match_impacts_batch(d["club"]),
+        ),
+        (
+            "win_ratio_batch",
+            "federation",
+            "federation",
+            lambda d: compute_win_ratio_batch(d["federation"]),
+        ),
+        (
+            "recommendation",
+            "10k_calls",
+            "recommendation_inputs",
+            lambda d: [
+                generate_recommendation(*args) for args in d["recommendation_inputs"]
+            ],
+        ),
+        (
+            "scenarios",
+            "club_24_future",
+            "club",
+            lambda d: solve_scenarios_batch(
+                d["club"], d["future_matches"], win_rate=0.5
+            ),
+        ),
+        (
+            "normalize_dicts",
+            "bulk",
+            "raw_bulk",
+            lambda d: normalize_tppwb_data(d["raw_bulk"]),
+        ),
+        (
+            "normalize_dicts",
+            "bulk_players",
+            "bulk_bodies",
+            lambda d: [
+                normalize_tppwb_data(json.loads(b)) for b in d["bulk_bodies"].values()
+            ],
+        ),
+        (
+            "normalize_columnar",
+            "bulk_players",
+            "bulk_bodies",
+            lambda d: normalize_tppwb_bodies(d["bulk_bodies"]),
+        ),
+    ]
+    for dataset, statement in COLD_IMPORTS.items():
+        cases.append(
+            ("cold_import", dataset, None, lambda d, s=statement: cold_import(s))
+        )
+    for name in fixture_paths():
+        cases.append(
+            (
+                "normalize_dicts",
+                name,
+                f"fixture:{name}",
+                lambda d, n=name: normalize_tppwb_data(d[f"fixture:{n}"]),
+            )
+        )
+    return cases
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=BENCH_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(quick=False, repeat=5, only=None):
+    results = []
+    data = Datasets(dataset_builders(quick))
+    for name, dataset, source, function in benchmark_cases():
+        if only and only not in name:
+            continue
+        rows = 1 if source is None else len(data[source])
+        best, median = measure(lambda: function(data), repeat)
+        results.append(
+            {
+                "name": name,
+                "dataset": dataset,
+                "rows": rows,
+                "repeat": repeat,
+                "best_s": best,
+                "median_s": median,
+                "rows_per_s": rows / best if best > 0 else None,
+            }
+        )
+        print(f"{name:<30} {dataset:<28} {rows:>9} rows  {best * 1000:10.3f} ms")
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "quick": quick,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+# Benchmarks whose best time grew by more than `threshold` (e.g. 1.25 = +25%)
+def find_regressions(previous, current, threshold):
+    baseline = {(r["name"], r["dataset"]): r for r in previous["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = baseline.get((result["name"], result["dataset"]))
+        if before is None or before["rows"] != result["rows"]:
+            continue
+        ratio = result["best_s"] / before["best_s"]
+        if ratio > threshold:
+            regressions.append(
+                dict(result, previous_best_s=before["best_s"], ratio=ratio)
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks du calculateur")
+    parser.add_argument("--output", help="Fichier JSON des résultats")
+    parser.add_argument("--compare", help="Résultats JSON d'une version précédente")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--quick", action="store_true", help="Jeux de données réduits"
+    )
+    parser.add_argument("--only", help="Ne lancer que les benchmarks contenant ce nom")
+    args = parser.parse_args(argv)
+
+    report = run(quick=args.quick, repeat=args.repeat, only=args.only)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        regressions = find_regressions(previous, report, args.threshold)
+        for r in regressions:
+            print(
+                f"REGRESSION {r['name']} [{r['dataset']}]: "
+                f"{r['previous_best_s'] * 1000:.3f} ms -> {r['best_s'] * 1000:.3f} ms "
+                f"(x{r['ratio']:.2f})"
+            )
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# ---------- benchmarks/synthetic.py ----------
+# Seeded generator of realistic match tables, in the normalized format of
+# the app (one row per match, keyed by affiliation number) and in the raw
+# GetResultsByPlayer format of the TPPWB API.
+import datetime
+
+import numpy as np
+import pandas as pd
+
+RANKS = np.array([50, 100, 200, 300, 400, 500, 700, 1000])
+
+# Share of players per ladder index, most players are in the low categories
+RANK_DISTRIBUTION = np.array([0.06, 0.30, 0.24, 0.16, 0.11, 0.07, 0.04, 0.02])
+
+COMPETITIONS = np.array(["Tour", "Interclubs", "Mixte", "Masters"])
+COMPETITION_DISTRIBUTION = np.array([0.55, 0.25, 0.17, 0.03])
+
+SEASON_START = datetime.datetime(2025, 7, 7)
+
+
+# Ladder index close to the player's one (partners and opponents)
+def _nearby_index(rng, idx, size):
+    return np.clip(idx + rng.integers(-1, 2, size) + rng.integers(-1, 2, size), 0, 7)
+
+
+def _affiliation_numbers(ids):
+    return np.char.zfill((1000000 + ids).astype(str), 7)
+
+
+def generate_matches(n_players=1, matches_per_player=40, seed=0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    counts = np.maximum(rng.poisson(matches_per_player, n_players), 1)
+    n = int(counts.sum())
+
+    player_ids = np.repeat(np.arange(n_players), counts)
+    women = rng.random(n_players) < 0.3
+    player_idx = rng.choice(8, n_players, p=RANK_DISTRIBUTION)
+    # Women ladder goes from P50 to P500, men ladder from P100 to P1000
+    player_idx = np.where(
+        women, np.minimum(player_idx, 5), np.maximum(player_idx, 1)
+    )
+
+    idx = player_idx[player_ids]
+    partner_idx = _nearby_index(rng, idx, n)
+    opp1_idx = _nearby_index(rng, idx, n)
+    opp2_idx = _nearby_index(rng, idx, n)
+
+    # Stronger pairs win more often
+    strength = (idx + partner_idx) - (opp1_idx + opp2_idx)
+    victories = rng.random(n) < 1 / (1 + np.exp(-0.6 * strength))
+
+    # Matches spread over the season, in date order for each player
+    offsets = rng.integers(0, 365 * 24 * 60, n)
+    order = np.lexsort((offsets, player_ids))
+    dates = pd.to_datetime(SEASON_START) + pd.to_timedelta(offsets[order], unit="m")
+
+    competition = rng.choice(COMPETITIONS, n, p=COMPETITION_DISTRIBUTION)
+    categories = np.where(
+        competition == "Mixte",
+        "MX" + RANKS[idx].astype(str),
+        "P" + RANKS[idx].astype(str),
+    )
+    frame = pd.DataFrame(
+        {
+            "numero_affiliation": _affiliation_numbers(player_ids),
+            "genre": np.where(women[player_ids], "Dames", "Messieurs"),
+            "resultat": np.where(victories, "Victoire", "Défaite"),
+            "type_competition": competition,
+            "phase": np.where(rng.random(n) < 0.35, "Tableau", "Poule"),
+            "classement_joueur": RANKS[idx],
+            "classement_partenaire": RANKS[partner_idx],
+            "classement_adversaire_1": RANKS[opp1_idx],
+            "classement_adversaire_2": RANKS[opp2_idx],
+            "categorie": categories,
+            "date": dates.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+    )
+    # Partners and opponents are other players, regular partners come back.
+    # Drawn last so that the other columns do not depend on them.
+    frame["affiliation_partenaire"] = _affiliation_numbers(
+        (player_ids + rng.integers(1, 4, n)) % n_players
+    )
+    frame["affiliation_adversaire_1"] = _affiliation_numbers(
+        rng.integers(0, n_players, n)
+    )
+    frame["affiliation_adversaire_2"] = _affiliation_numbers(
+        rng.integers(0, n_players, n)
+    )
+    return frame
+
+
+# Raw GetResultsByPlayer records of one player, in API order (most recent first)
+def generate_raw_results(n_matches=40, seed=0, women=False):
+    rng = np.random.default_rng(seed)
+    ladder = range(0, 6) if women else range(1, 8)
+    weights = RANK_DISTRIBUTION[list(ladder)]
+    player_idx = int(rng.choice(list(ladder), p=weights / weights.sum()))
+    player_rank = int(RANKS[player_idx])
+    prefix = "WD" if women else "MD"
+
+    records = []
+    for _ in range(n_matches):
+        partner = int(RANKS[_nearby_index(rng, player_idx, 1)[0]])
+        opponents = RANKS[_nearby_index(rng, player_idx, 2)]
+        kind = rng.choice(["tour", "interclubs", "mixte"], p=[0.6, 0.25, 0.15])
+        if kind == "mixte":
+            category = f"MX{player_rank}"
+        elif kind == "interclubs":
+            category = f"IC{player_rank}"
+        else:
+            category = f"{prefix}{player_rank}"
+        victory = bool(rng.random() < 0.5)
+        score = "6/4 6/3" if victory else "3/6 4/6"
+        if rng.random() < 0.02:
+            score = "0/0"
+        elif rng.random() < 0.01:
+            score = "6/2 Bless."
+        date = SEASON_START + datetime.timedelta(
+            minutes=int(rng.integers(0, 365 * 24 * 60))
+        )
+        record = {
+            "Date": date.strftime("%Y-%m-%dT%H:%M:%S"),
+            "Category": category,
+            "VictoryOrDefeat": "V" if victory else "D",
+            "Score": score,
+            "DrawType": "S" if rng.random() < 0.3 else "P",
+            "TypeTab": "Tour Final" if rng.random() < 0.05 else "",
+            "DoublePairValue": str(player_rank + partner),
+            "PartnerDoubleValue": str(partner),
+            "OpponentDoubleValue1": str(opponents[0]),
+            # Missing opponent ranking, handled by the normalization
+            "OpponentDoubleValue2": (
+                "" if rng.random() < 0.03 else str(opponents[1])
+            ),
+        }
+        partner, opponent1, opponent2 = rng.integers(1000000, 1000200, 3).tolist()
+        record.update(
+            {
+                "PartnerAffiliationNumber": str(partner),
+                "PartnerName": f"Partenaire {partner}",
+                "OpponentAffiliationNumber1": str(opponent1),
+                "OpponentName1": f"Adversaire {opponent1}",
+                "OpponentAffiliationNumber2": str(opponent2),
+                "OpponentName2": f"Adversaire {opponent2}",
+            }
+        )
+        records.append(record)
+    return sorted(records, key=lambda r: r["Date"], reverse=True)
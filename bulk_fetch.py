@@ -0,0 +1,202 @@
+# ---------- bulk_fetch.py ----------
+# Fetch TPPWB results for many affiliation numbers concurrently.
+# Each player is yielded as soon as its requests complete; a failing player
+# is reported in its "error" field without stopping the other ones.
+# fetch_match_tables does the same for bulk ingestion, by batches of players.
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tppwb import (
+    TppwbClient,
+    current_semester_start,
+    previous_semester_start,
+    tppwb_matches,
+    tppwb_player_info,
+    tppwb_raw_body,
+)
+
+
+# Token bucket shared by the worker threads: at most `rate` requests per
+# second on average, with bursts of up to `burst` requests
+class RateLimiter:
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._resume = self._last
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._last) * self.rate
+                )
+                self._last = now
+                if now < self._resume:
+                    wait = self._resume - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    # No token before `seconds` from now (Retry-After of a 429 answer)
+    def defer(self, seconds):
+        with self._lock:
+            self._resume = max(self._resume, time.monotonic() + seconds)
+
+
+# Client whose calls each take one token. A TppwbClient takes one per HTTP
+# attempt instead (see limit_rate); this wrapper is for other clients.
+class RateLimitedClient:
+    def __init__(self, client, rate_limiter):
+        self.client = client
+        self.rate_limiter = rate_limiter
+
+    def get_json(self, path, params=None):
+        self.rate_limiter.acquire()
+        return self.client.get_json(path, params=params)
+
+    def get_content(self, path, params=None):
+        self.rate_limiter.acquire()
+        return self.client.get_content(path, params=params)
+
+
+# Client of the worker threads, sharing `rate_limiter`
+def limit_rate(client, rate_limiter):
+    if isinstance(client, TppwbClient):
+        return client.with_rate_limiter(rate_limiter)
+    return RateLimitedClient(client, rate_limiter)
+
+
+def fetch_player(affiliation_number, client, with_player_info=True):
+    result = {
+        "affiliation_number": affiliation_number,
+        "player_info": None,
+        "matches": [],
+        "category_change": False,
+        "date_from": None,
+        "error": None,
+    }
+    try:
+        if with_player_info:
+            player_infos = tppwb_player_info(affiliation_number, client=client)
+            result["player_info"] = (
+                player_infos[0]
+                if isinstance(player_infos, list) and player_infos
+                else None
+            )
+        matches, category_change, date_from = tppwb_matches(
+            affiliation_number, client=client
+        )
+        result["matches"] = matches
+        result["category_change"] = category_change
+        result["date_from"] = date_from
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+# Generator over the results of every player, in order of completion
+def fetch_players(
+    affiliation_numbers,
+    max_workers=8,
+    requests_per_second=10.0,
+    burst=None,
+    client=None,
+    with_player_info=True,
+):
+    # A client created here (one pooled connection per worker) is closed here
+    own_client = TppwbClient(pool_size=max_workers) if client is None else None
+    rate_limiter = RateLimiter(requests_per_second, burst or max_workers)
+    limited_client = limit_rate(client or own_client, rate_limiter)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(fetch_player, number, limited_client, with_player_info)
+                for number in dict.fromkeys(affiliation_numbers)
+            ]
+            try:
+                for future in as_completed(futures):
+                    yield future.result()
+            finally:
+                # Stop queued players if the caller stops iterating early
+                for future in futures:
+                    future.cancel()
+    finally:
+        if own_client is not None:
+            own_client.close()
+
+
+# Bulk ingestion: the matches of many players as tables, normalized in one
+# columnar pass per batch of `batch_size` players (tppwb_columnar) instead of
+# one dict per match. Yields one dict per batch, in order of completion:
+#   matches          - DataFrame of the matches ("numero_affiliation" and the
+#                      match columns), e.g. for storage.write_matches
+#   category_changes - players whose matches start at date_from_changed
+#   date_from, date_from_changed - start of the matches, as in tppwb_matches
+#   errors           - {affiliation_number: error} of the failed players
+def fetch_match_tables(
+    affiliation_numbers,
+    batch_size=500,
+    max_workers=8,
+    requests_per_second=10.0,
+    burst=None,
+    client=None,
+):
+    # pyarrow is only loaded for bulk ingestion
+    from tppwb_columnar import filter_category_change_frame, normalize_tppwb_bodies
+
+    today = datetime.date.today()
+    date_from = previous_semester_start(today)
+    own_client = TppwbClient(pool_size=max_workers) if client is None else None
+    rate_limiter = RateLimiter(requests_per_second, burst or max_workers)
+    limited_client = limit_rate(client or own_client, rate_limiter)
+
+    def flush(bodies, errors):
+        frame, read_errors = normalize_tppwb_bodies(bodies)
+        frame, category_changes = filter_category_change_frame(frame, today)
+        return {
+            "matches": frame,
+            "category_changes": category_changes,
+            "date_from": date_from,
+            "date_from_changed": current_semester_start(today),
+            "errors": {**errors, **read_errors},
+        }
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    tppwb_raw_body, number, date_from, limited_client
+                ): number
+                for number in dict.fromkeys(affiliation_numbers)
+            }
+            bodies = {}
+            errors = {}
+            try:
+                for future in as_completed(futures):
+                    number = futures[future]
+                    try:
+                        bodies[number] = future.result()
+                    except Exception as e:
+                        errors[number] = f"{type(e).__name__}: {e}"
+                    if len(bodies) + len(errors) >= batch_size:
+                        yield flush(bodies, errors)
+                        bodies, errors = {}, {}
+                if bodies or errors:
+                    yield flush(bodies, errors)
+            finally:
+                # Stop queued players if the caller stops iterating early
+                for future in futures:
+                    future.cancel()
+    finally:
+        if own_client is not None:
+            own_client.close()
@@ -0,0 +1,174 @@
+# ---------- cache.py ----------
+# Persistent cache of TPPWB API responses, shared by all sessions and processes.
+# Entries are stored as JSON in SQLite with a TTL per endpoint; the least
+# recently used entries are evicted once the cache holds max_entries.
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from timing import count
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "TPPWB_CACHE_PATH", os.path.join(tempfile.gettempdir(), "tppwb_cache.sqlite3")
+)
+
+# Results change at most a few times a day, player names and ranks much less often.
+# "matches" holds normalized results (see tppwb.tppwb_matches_streaming).
+DEFAULT_TTLS = {"results": 30 * 60, "matches": 30 * 60, "player_info": 24 * 60 * 60}
+
+DEFAULT_MAX_ENTRIES = 20000
+
+
+# Connection of the current thread to the SQLite file at `path`, kept in
+# `local` (a threading.local): sqlite3 connections are not shared across threads
+def thread_connection(local, path):
+    db = getattr(local, "db", None)
+    if db is None:
+        db = sqlite3.connect(path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        local.db = db
+    return db
+
+
+class ResponseCache:
+    def __init__(
+        self, path=DEFAULT_CACHE_PATH, ttls=None, max_entries=DEFAULT_MAX_ENTRIES
+    ):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " endpoint TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL,"
+                " PRIMARY KEY (endpoint, key))"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS counters ("
+                " endpoint TEXT PRIMARY KEY,"
+                " hits INTEGER NOT NULL DEFAULT 0, misses INTEGER NOT NULL DEFAULT 0)"
+            )
+
+    def _connection(self):
+        return thread_connection(self._local, self.path)
+
+    def _count(self, db, endpoint, column):
+        db.execute(
+            "INSERT OR IGNORE INTO counters (endpoint) VALUES (?)",
+            (endpoint,),
+        )
+        db.execute(
+            f"UPDATE counters SET {column} = {column} + 1 WHERE endpoint = ?",
+            (endpoint,),
+        )
+
+    # Returns (True, value) on a fresh hit, (False, None) otherwise
+    def get(self, endpoint, key):
+        now = time.time()
+        ttl = self.ttls.get(endpoint, 0)
+        with self._connection() as db:
+            row = db.execute(
+                "SELECT value, created FROM responses WHERE endpoint = ? AND key = ?",
+                (endpoint, key),
+            ).fetchone()
+            if row is None or now - row[1] > ttl:
+                self._count(db, endpoint, "misses")
+                return False, None
+            db.execute(
+                "UPDATE responses SET accessed = ? WHERE endpoint = ? AND key = ?",
+                (now, endpoint, key),
+            )
+            self._count(db, endpoint, "hits")
+        return True, json.loads(row[0])
+
+    def set(self, endpoint, key, value):
+        now = time.time()
+        with self._connection() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO responses (endpoint, key, value, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (endpoint, key, json.dumps(value), now, now),
+            )
+            excess = (
+                db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                - self.max_entries
+            )
+            if excess > 0:
+                db.execute(
+                    "DELETE FROM responses WHERE rowid IN"
+                    " (SELECT rowid FROM responses ORDER BY accessed LIMIT ?)",
+                    (excess,),
+                )
+
+    def stats(self):
+        with self._connection() as db:
+            rows = db.execute("SELECT endpoint, hits, misses FROM counters").fetchall()
+            entries = db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "entries": entries,
+            "endpoints": {
+                endpoint: {"hits": hits, "misses": misses}
+                for endpoint, hits, misses in rows
+            },
+        }
+
+    def clear(self):
+        with self._connection() as db:
+            db.execute("DELETE FROM responses")
+            db.execute("DELETE FROM counters")
+
+
+# Cache lookup that treats cache failures (locked or corrupted file, ...) as misses
+def cache_lookup(cache, endpoint, key):
+    if cache is None:
+        return False, None
+    try:
+        return cache.get(endpoint, key)
+    except sqlite3.Error:
+        return False, None
+
+
+# Cached call: returns the cached value or computes, stores and returns it.
+# Cache failures never block the real call.
+def cached_call(cache, endpoint, key, compute):
+    found, value = cache_lookup(cache, endpoint, key)
+    if cache is not None:
+        count(f"cache.{endpoint}.{'hit' if found else 'miss'}")
+    if found:
+        return value
+    value = compute()
+    if cache is not None:
+        try:
+            cache.set(endpoint, key, value)
+        except sqlite3.Error:
+            pass
+    return value
+
+
+_UNSET = object()
+_cache = _UNSET
+
+
+def get_cache():
+    global _cache
+    if _cache is _UNSET:
+        try:
+            _cache = ResponseCache() if DEFAULT_CACHE_PATH else None
+        except sqlite3.Error:
+            _cache = None
+    return _cache
+
+
+# Replace the shared cache (None disables caching)
+def set_cache(cache):
+    global _cache
+    _cache = cache
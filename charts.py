@@ -0,0 +1,71 @@
+# ---------- charts.py ----------
+# Ratio evolution chart. The default is a Vega-Lite spec drawn by the browser
+# (st.vega_lite_chart): nothing is rasterized on the server. The matplotlib
+# figure is kept as an alternative and only imports matplotlib when used.
+
+X_LABEL = "Nombre de matchs"
+Y_LABEL = "Pourcentage de victoires ajusté [%]"
+COLOR = "orangered"
+
+
+# Ticks of the x axis: first and last match, then every match or every 5th
+def ratio_ticks(count):
+    ticks = {1, count}
+    if count + 1 <= 20:
+        ticks.update(range(2, count))
+    else:
+        ticks.update(range(5, count, 5))
+    return sorted(ticks)
+
+
+def ratio_chart_spec(ratios):
+    return {
+        "data": {
+            "values": [
+                {"match": i, "ratio": ratio} for i, ratio in enumerate(ratios, 1)
+            ]
+        },
+        "mark": {"type": "line", "point": True, "color": COLOR, "strokeWidth": 2},
+        "encoding": {
+            "x": {
+                "field": "match",
+                "type": "quantitative",
+                "title": X_LABEL,
+                "axis": {"values": ratio_ticks(len(ratios))},
+            },
+            "y": {"field": "ratio", "type": "quantitative", "title": Y_LABEL},
+        },
+    }
+
+
+def ratio_figure(ratios):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    ax.plot(range(1, len(ratios) + 1), ratios, marker="o", color=COLOR, lw=2)
+    ax.set_xticks(ratio_ticks(len(ratios)))
+    ax.set_xlabel(X_LABEL, loc="right")
+    ax.set_ylabel(
+        "Pourcentage de\nvictoires ajusté\n[%]",
+        va="top",
+        loc="top",
+        rotation="horizontal",
+        labelpad=20,
+    )
+    ax.grid(True)
+    return fig
+
+
+# Draw the chart in the page. "matplotlib" renders a PNG on every rerun and
+# closes the figure afterwards so that it does not stay in memory.
+def render_ratio_chart(st, ratios, backend="vega"):
+    if backend == "matplotlib":
+        import matplotlib.pyplot as plt
+
+        fig = ratio_figure(ratios)
+        try:
+            st.pyplot(fig)
+        finally:
+            plt.close(fig)
+    else:
+        st.vega_lite_chart(ratio_chart_spec(ratios))
@@ -0,0 +1,252 @@
+# ---------- history.py ----------
+# Local per-player history of raw TPPWB results, for incremental syncs.
+# Only the results played since the last stored match (the high-water mark)
+# are requested; they replace the stored results of that period, and the
+# stored set then goes through the same normalization as tppwb_matches.
+# Results corrected or deleted upstream are picked up when their period is
+# requested again: the high-water mark day on every sync, and the whole
+# window of tppwb_matches on a full sync (first sync, then every
+# FULL_SYNC_INTERVAL).
+# Nightly sync: python history.py 1234567 7654321 [--history historique.sqlite3]
+#               [--full]
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import threading
+
+from cache import thread_connection
+from tppwb import (
+    IDENTITY_FIELDS,
+    TppwbClient,
+    filter_category_change,
+    normalize_tppwb_data,
+    previous_semester_start,
+    tppwb_raw_data,
+)
+
+DEFAULT_HISTORY_PATH = os.environ.get(
+    "TPPWB_HISTORY_PATH",
+    os.path.join(tempfile.gettempdir(), "tppwb_history.sqlite3"),
+)
+
+# Fields identifying a match when the API does not give an identifier
+MATCH_KEY_FIELDS = (
+    "Date",
+    "Category",
+    "VictoryOrDefeat",
+    "Score",
+    "DrawType",
+    "TypeTab",
+    "DoublePairValue",
+    "PartnerDoubleValue",
+    "OpponentDoubleValue1",
+    "OpponentDoubleValue2",
+    # Partner and opponents: same rankings and score against other players
+    *IDENTITY_FIELDS.values(),
+)
+
+FULL_SYNC_INTERVAL = datetime.timedelta(days=7)
+
+
+# Keys of the records of one API answer. Identical records (same fields,
+# e.g. without identity fields) are numbered so that none of them is lost.
+def match_keys(records):
+    occurrences = {}
+    keys = []
+    for record in records:
+        fields = json.dumps([record.get(field) for field in MATCH_KEY_FIELDS])
+        occurrence = occurrences.get(fields, 0)
+        occurrences[fields] = occurrence + 1
+        keys.append(f"{fields}#{occurrence}")
+    return keys
+
+
+class MatchHistory:
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS matches ("
+                " affiliation_number TEXT NOT NULL, match_key TEXT NOT NULL,"
+                " date TEXT NOT NULL, record TEXT NOT NULL,"
+                " PRIMARY KEY (affiliation_number, match_key))"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS matches_date"
+                " ON matches (affiliation_number, date)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS syncs ("
+                " affiliation_number TEXT PRIMARY KEY, full_sync TEXT NOT NULL)"
+            )
+
+    def _connection(self):
+        return thread_connection(self._local, self.path)
+
+    # Date of the most recent stored match, None if nothing is stored
+    def high_water_mark(self, affiliation_number):
+        with self._connection() as db:
+            row = db.execute(
+                "SELECT MAX(date) FROM matches WHERE affiliation_number = ?",
+                (str(affiliation_number),),
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return datetime.date.fromisoformat(row[0][:10])
+
+    def records(self, affiliation_number, date_from=None):
+        query = "SELECT record FROM matches WHERE affiliation_number = ?"
+        params = [str(affiliation_number)]
+        if date_from is not None:
+            query += " AND date >= ?"
+            params.append(date_from.isoformat())
+        with self._connection() as db:
+            rows = db.execute(query + " ORDER BY date, rowid", params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    # Replace the stored records played since `date_from` by `records`, the
+    # answer of the API for that period: corrected results replace the stored
+    # ones and results deleted upstream are removed.
+    # Returns the number of records that were not stored yet.
+    def replace_since(self, affiliation_number, date_from, records):
+        records = [record for record in records if isinstance(record, dict)]
+        rows = [
+            (
+                str(affiliation_number),
+                key,
+                record.get("Date") or "",
+                json.dumps(record),
+            )
+            for record, key in zip(records, match_keys(records))
+        ]
+        with self._connection() as db:
+            stored = {
+                key
+                for (key,) in db.execute(
+                    "SELECT match_key FROM matches WHERE affiliation_number = ?",
+                    (str(affiliation_number),),
+                )
+            }
+            db.execute(
+                "DELETE FROM matches WHERE affiliation_number = ? AND date >= ?",
+                (str(affiliation_number), date_from.isoformat()),
+            )
+            # Records without date are outside any period: replaced by key
+            db.executemany(
+                "INSERT OR REPLACE INTO matches"
+                " (affiliation_number, match_key, date, record) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        return sum(1 for row in rows if row[1] not in stored)
+
+    # Day of the last full sync, None if there was none
+    def last_full_sync(self, affiliation_number):
+        with self._connection() as db:
+            row = db.execute(
+                "SELECT full_sync FROM syncs WHERE affiliation_number = ?",
+                (str(affiliation_number),),
+            ).fetchone()
+        return None if row is None else datetime.date.fromisoformat(row[0])
+
+    def set_full_sync(self, affiliation_number, day):
+        with self._connection() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO syncs (affiliation_number, full_sync)"
+                " VALUES (?, ?)",
+                (str(affiliation_number), day.isoformat()),
+            )
+
+    # Drop matches older than the window used by tppwb_matches
+    def prune(self, affiliation_number, date_from):
+        with self._connection() as db:
+            db.execute(
+                "DELETE FROM matches WHERE affiliation_number = ? AND date < ?",
+                (str(affiliation_number), date_from.isoformat()),
+            )
+
+
+# Fetch only the new results of a player and merge them into the history.
+# The high-water mark day itself is requested again (dateFrom has a one day
+# resolution) and its stored results are replaced by the answer. A full sync
+# (forced with full=True) requests and replaces the whole window.
+def sync_player(affiliation_number, history, client=None, today=None, full=False):
+    today = today or datetime.date.today()
+    date_from = previous_semester_start(today)
+
+    history.prune(affiliation_number, date_from)
+    last_date = history.high_water_mark(affiliation_number)
+    last_full_sync = history.last_full_sync(affiliation_number)
+    full = (
+        full
+        or last_date is None
+        or last_full_sync is None
+        or today - last_full_sync >= FULL_SYNC_INTERVAL
+    )
+    fetch_from = date_from if full else max(date_from, last_date)
+
+    new_records = tppwb_raw_data(affiliation_number, fetch_from, client=client)
+    added = history.replace_since(affiliation_number, fetch_from, new_records)
+    if full:
+        history.set_full_sync(affiliation_number, today)
+    return history.records(affiliation_number, date_from), added
+
+
+# Incremental equivalent of tppwb_matches
+def tppwb_matches_incremental(affiliation_number, history=None, client=None):
+    history = history or MatchHistory()
+    today = datetime.date.today()
+    tppwb_data, _ = sync_player(
+        affiliation_number, history, client=client, today=today
+    )
+    matches = normalize_tppwb_data(tppwb_data)
+    return filter_category_change(matches, today, previous_semester_start(today))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Synchronisation incrémentale de l'historique des résultats TPPWB"
+    )
+    parser.add_argument(
+        "affiliation_numbers", nargs="+", help="Numéros d'affiliation des joueurs"
+    )
+    parser.add_argument(
+        "--history",
+        default=DEFAULT_HISTORY_PATH,
+        help="Fichier SQLite de l'historique",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Retélécharger toute la période au lieu des seuls nouveaux résultats",
+    )
+    args = parser.parse_args(argv)
+
+    history = MatchHistory(args.history)
+    client = TppwbClient()
+    failed = 0
+    try:
+        for number in dict.fromkeys(args.affiliation_numbers):
+            try:
+                records, added = sync_player(
+                    number, history, client=client, full=args.full
+                )
+            except Exception as e:
+                # A failing player does not stop the other ones
+                failed += 1
+                print(f"{number} : erreur {type(e).__name__}: {e}", flush=True)
+                continue
+            print(
+                f"{number} : {added} nouveaux résultats, {len(records)} au total",
+                flush=True,
+            )
+    finally:
+        client.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# ---------- match_index.py ----------
+# In-memory inverted index over a long match table (one row per match and
+# player, with the partner and opponent affiliation numbers kept by the
+# normalization, see tppwb.IDENTITY_FIELDS).
+# Everything is computed once when the index is built: row lists per partner,
+# per (player, partner) and per (player, opponent), win / loss records and
+# weighted ratios per partner. Queries are then dict lookups, without
+# scanning the matches (e.g. thousands of queries for interclub lineups).
+import numpy as np
+import pandas as pd
+
+from backend import compute_match_weights
+
+OPPONENT_FIELDS = ("affiliation_adversaire_1", "affiliation_adversaire_2")
+
+_NO_ROWS = np.zeros(0, dtype=np.intp)
+
+
+# Groups of rows sharing the same keys, rows with a missing key left out.
+# Returns the group of each row (-1 if left out) and {keys: rows} in group
+# order, the rows of a group being in increasing order.
+def _postings(*columns, rows=None):
+    n = len(columns[0])
+    rows = np.arange(n) if rows is None else rows
+    group = np.zeros(n, dtype=np.int64)
+    labels = []
+    for column in columns:
+        codes, uniques = pd.factorize(column)
+        group = group * (len(uniques) + 1) + codes
+        labels.append((codes, uniques))
+    valid = np.logical_and.reduce([codes >= 0 for codes, _ in labels])
+    group = np.where(valid, group, -1)
+    group[valid], _ = pd.factorize(group[valid])
+
+    order = np.lexsort((rows, group))
+    order = order[group[order] >= 0]
+    counts = np.bincount(group[valid])
+    starts = np.concatenate([[0], np.cumsum(counts)])
+    # Keys of each group, read on its first row
+    firsts = order[starts[:-1]]
+    keys = [uniques[codes[firsts]].tolist() for codes, uniques in labels]
+    keys = keys[0] if len(keys) == 1 else list(zip(*keys))
+    sorted_rows = rows[order]
+    postings = {
+        key: sorted_rows[start:end]
+        for key, start, end in zip(keys, starts[:-1].tolist(), starts[1:].tolist())
+    }
+    return group, postings
+
+
+class MatchIndex:
+    def __init__(self, df, key="numero_affiliation", rules=None):
+        df = df[df[key].notna()].reset_index(drop=True)
+        for field in ("affiliation_partenaire", *OPPONENT_FIELDS):
+            if field not in df:
+                df[field] = None
+        self.key = key
+        self.matches = df
+        weights, scores = compute_match_weights(df, rules)
+        victories = (df["resultat"].str.lower() == "victoire").to_numpy()
+        players = df[key].to_numpy(dtype=object)
+        partners = df["affiliation_partenaire"].to_numpy(dtype=object)
+        opp1, opp2 = (df[field].to_numpy(dtype=object) for field in OPPONENT_FIELDS)
+
+        _, self._by_partner = _postings(partners)
+        pairs, self._by_player_partner = _postings(players, partners)
+
+        # A match counts once against an opponent, even if listed twice
+        rows = np.arange(len(df))
+        _, self._by_player_opponent = _postings(
+            np.concatenate([players, players]),
+            np.concatenate([opp1, np.where(opp2 == opp1, None, opp2)]),
+            rows=np.concatenate([rows, rows]),
+        )
+        self._records = {}
+        for pair, pair_rows in self._by_player_opponent.items():
+            wins = int(np.count_nonzero(victories[pair_rows]))
+            self._records[pair] = {
+                "victoires": wins,
+                "défaites": len(pair_rows) - wins,
+                "nombre_matchs": len(pair_rows),
+            }
+
+        # Sums in match order, as compute_win_ratio_batch does per player
+        kept = pairs >= 0
+        total_points = np.zeros(len(self._by_player_partner))
+        total_weights = np.zeros(len(self._by_player_partner))
+        np.add.at(total_points, pairs[kept], scores[kept])
+        np.add.at(total_weights, pairs[kept], weights[kept])
+        match_counts = np.bincount(pairs[kept], minlength=len(total_points))
+        self._partner_ratios = {}
+        # The postings are in group order
+        for group, (player, partner) in enumerate(self._by_player_partner):
+            weight = total_weights[group]
+            self._partner_ratios.setdefault(player, {})[partner] = {
+                "ratio": (
+                    round(float(total_points[group] / weight * 100), 2)
+                    if weight
+                    else 0.0
+                ),
+                "nombre_matchs": int(match_counts[group]),
+            }
+
+    # Index of the matches of a Parquet store (see storage.read_matches)
+    @classmethod
+    def from_store(cls, root, key="numero_affiliation", rules=None, **filters):
+        from storage import read_matches
+
+        return cls(read_matches(root, **filters), key=key, rules=rules)
+
+    def __len__(self):
+        return len(self.matches)
+
+    # Row positions in self.matches, in match order
+    def rows_with_partner(self, partner, player=None):
+        if player is None:
+            return self._by_partner.get(str(partner), _NO_ROWS)
+        return self._by_player_partner.get((str(player), str(partner)), _NO_ROWS)
+
+    def rows_against(self, player, opponent):
+        return self._by_player_opponent.get((str(player), str(opponent)), _NO_ROWS)
+
+    # Matches played with `partner` (by every player, or by `player` only)
+    def matches_with_partner(self, partner, player=None) -> pd.DataFrame:
+        return self.matches.take(self.rows_with_partner(partner, player))
+
+    def matches_against(self, player, opponent) -> pd.DataFrame:
+        return self.matches.take(self.rows_against(player, opponent))
+
+    # Wins and losses of `player` against `opponent`
+    def record_against(self, player, opponent) -> dict:
+        record = self._records.get((str(player), str(opponent)))
+        if record is None:
+            return {"victoires": 0, "défaites": 0, "nombre_matchs": 0}
+        return dict(record)
+
+    # {partner: {"ratio": ..., "nombre_matchs": ...}} of the matches of
+    # `player`, the ratio being computed on the matches with that partner only
+    def weighted_ratio_by_partner(self, player) -> dict:
+        return {
+            partner: dict(stats)
+            for partner, stats in self._partner_ratios.get(str(player), {}).items()
+        }
@@ -0,0 +1,293 @@
+# ---------- matchtable.py ----------
+# Compact match list: one numpy array per field (struct of arrays) with small
+# integer codes instead of dicts with repeated keys and strings.
+# MatchTable.from_dicts / to_dicts convert from / to the format of
+# tppwb_matches and of the JSON files without loss: a value without an exact
+# code (other spelling, float ranking, unknown key, ...) is also kept as is
+# in `extras`, a dict {row: {field: value}} which stays empty in practice.
+# Text fields (category, partner and opponents) are codes into `strings`.
+# The engine (backend.compute_match_weights) reads the code arrays directly.
+import hashlib
+import json
+
+import numpy as np
+
+from backend import (
+    COMPETITION_FACTORS,
+    DEFAULT_RULES,
+    PHASE_FACTORS,
+    RANKS,
+    combine_match_weights,
+    factor_arrays,
+)
+from tppwb import IDENTITY_FIELDS
+
+GENDERS = ("Messieurs", "Dames")
+RESULTS = ("Défaite", "Victoire")
+PHASES = tuple(PHASE_FACTORS)
+COMPETITIONS = tuple(COMPETITION_FACTORS)
+
+ENUM_FIELDS = {
+    "genre": GENDERS,
+    "resultat": RESULTS,
+    "type_competition": COMPETITIONS,
+    "phase": PHASES,
+}
+# Compared in lower case, like the engine and generate_recommendation do
+CASE_INSENSITIVE_FIELDS = {"genre", "resultat"}
+
+# Stored as ladder indices (position in RANKS)
+RANKING_FIELDS = (
+    "classement_joueur",
+    "classement_partenaire",
+    "classement_adversaire_1",
+    "classement_adversaire_2",
+)
+
+# Stored as codes into the strings of the table
+STRING_FIELDS = ("categorie", *IDENTITY_FIELDS)
+
+# In the order of normalize_tppwb_item
+MATCH_FIELDS = (*ENUM_FIELDS, *RANKING_FIELDS, "categorie", "date", *IDENTITY_FIELDS)
+
+# Code of a missing field (or of a value kept in extras only)
+MISSING = -1
+
+_ABSENT = object()
+
+
+# Engine lookup arrays of the default rules, indexed by phase and competition
+# codes
+_DEFAULT_FACTORS = factor_arrays(DEFAULT_RULES, PHASES, COMPETITIONS)
+
+
+def _same(a, b):
+    return type(a) is type(b) and a == b
+
+
+# Decoding table of a code array: index MISSING (-1) reads the last element
+def _decoding_table(values):
+    table = np.empty(len(values) + 1, dtype=object)
+    table[:-1] = values
+    table[-1] = _ABSENT
+    return table
+
+
+class MatchTable:
+    __slots__ = ("codes", "strings", "extras")
+
+    def __init__(self, codes, strings, extras=None):
+        # field -> numpy array: int8 codes, int32 string codes and
+        # datetime64[s] dates (NaT when missing)
+        self.codes = codes
+        # Distinct values of the STRING_FIELDS, indexed by their codes
+        self.strings = strings
+        self.extras = extras or {}
+
+    @classmethod
+    def from_dicts(cls, matches):
+        matches = list(matches)
+        n = len(matches)
+        extras = {}
+
+        def keep(row, field, value):
+            extras.setdefault(row, {})[field] = value
+
+        codes = {}
+        for field, vocabulary in ENUM_FIELDS.items():
+            lower = field in CASE_INSENSITIVE_FIELDS
+            lookup = {(v.lower() if lower else v): i for i, v in enumerate(vocabulary)}
+            column = np.full(n, MISSING, dtype=np.int8)
+            for row, match in enumerate(matches):
+                value = match.get(field, _ABSENT)
+                if value is _ABSENT:
+                    continue
+                key = value.lower() if lower and isinstance(value, str) else value
+                code = lookup.get(key, MISSING) if isinstance(key, str) else MISSING
+                column[row] = code
+                if code == MISSING or not _same(vocabulary[code], value):
+                    keep(row, field, value)
+            codes[field] = column
+
+        rank_index = {r: i for i, r in enumerate(RANKS)}
+        for field in RANKING_FIELDS:
+            column = np.full(n, MISSING, dtype=np.int8)
+            for row, match in enumerate(matches):
+                value = match.get(field, _ABSENT)
+                if value is _ABSENT:
+                    continue
+                try:
+                    code = rank_index.get(value, MISSING)
+                except TypeError:
+                    code = MISSING
+                column[row] = code
+                # e.g. 100.0 from an older manual entry
+                if code == MISSING or not _same(RANKS[code], value):
+                    keep(row, field, value)
+            codes[field] = column
+
+        strings = []
+        string_index = {}
+        for field in STRING_FIELDS:
+            column = np.full(n, MISSING, dtype=np.int32)
+            for row, match in enumerate(matches):
+                value = match.get(field, _ABSENT)
+                if value is _ABSENT:
+                    continue
+                if not isinstance(value, str):
+                    keep(row, field, value)
+                    continue
+                if value not in string_index:
+                    string_index[value] = len(strings)
+                    strings.append(value)
+                column[row] = string_index[value]
+            codes[field] = column
+
+        dates = np.full(n, np.datetime64("NaT"), dtype="datetime64[s]")
+        for row, match in enumerate(matches):
+            value = match.get("date", _ABSENT)
+            if value is _ABSENT:
+                continue
+            try:
+                date = np.datetime64(value, "s")
+            except (TypeError, ValueError):
+                date = None
+            if isinstance(value, str) and date is not None:
+                dates[row] = date
+                # Other formats than "%Y-%m-%dT%H:%M:%S" are kept as written
+                if np.datetime_as_string(date, unit="s") == value:
+                    continue
+            keep(row, "date", value)
+        codes["date"] = dates
+
+        for row, match in enumerate(matches):
+            for field, value in match.items():
+                if field not in MATCH_FIELDS:
+                    keep(row, field, value)
+
+        return cls(codes, strings, extras)
+
+    @classmethod
+    def empty(cls):
+        return cls.from_dicts([])
+
+    def __len__(self):
+        return len(self.codes["resultat"])
+
+    # Rows selected by a slice, e.g. table[:-1] without the last match
+    def __getitem__(self, rows):
+        if not isinstance(rows, slice):
+            raise TypeError("MatchTable ne supporte que les tranches (slices)")
+        positions = range(len(self))[rows]
+        extras = {}
+        for new_row, row in enumerate(positions):
+            if row in self.extras:
+                extras[new_row] = dict(self.extras[row])
+        codes = {field: column[rows].copy() for field, column in self.codes.items()}
+        return MatchTable(codes, list(self.strings), extras)
+
+    # New table with the matches of `other` after those of this table
+    def concat(self, other):
+        strings = list(self.strings)
+        string_index = {c: i for i, c in enumerate(strings)}
+        for value in other.strings:
+            if value not in string_index:
+                string_index[value] = len(strings)
+                strings.append(value)
+        remap = np.array(
+            [string_index[c] for c in other.strings] + [MISSING], dtype=np.int32
+        )
+
+        codes = {}
+        for field, column in self.codes.items():
+            added = other.codes[field]
+            if field in STRING_FIELDS:
+                added = remap[added]
+            codes[field] = np.concatenate([column, added])
+
+        extras = {row: dict(values) for row, values in self.extras.items()}
+        offset = len(self)
+        for row, values in other.extras.items():
+            extras[offset + row] = dict(values)
+        return MatchTable(codes, strings, extras)
+
+    # Decoded values of one field, _ABSENT for missing ones
+    def _column(self, field, rows=slice(None)):
+        codes = self.codes[field][rows]
+        if field in ENUM_FIELDS:
+            return _decoding_table(ENUM_FIELDS[field])[codes].tolist()
+        if field in RANKING_FIELDS:
+            return _decoding_table(RANKS)[codes].tolist()
+        if field in STRING_FIELDS:
+            return _decoding_table(self.strings)[codes].tolist()
+        return [
+            _ABSENT if text == "NaT" else text
+            for text in np.datetime_as_string(codes, unit="s").tolist()
+        ]
+
+    # Value of one field of one match, as in the dict format (None if missing)
+    def _value(self, row, field):
+        extras = self.extras.get(row, {})
+        if field in extras:
+            return extras[field]
+        value = self._column(field, slice(row, row + 1))[0]
+        return None if value is _ABSENT else value
+
+    def to_dicts(self):
+        columns = [self._column(field) for field in MATCH_FIELDS]
+        matches = []
+        for row, values in enumerate(zip(*columns)):
+            match = {
+                field: value
+                for field, value in zip(MATCH_FIELDS, values)
+                if value is not _ABSENT
+            }
+            if row in self.extras:
+                match.update(self.extras[row])
+            matches.append(match)
+        return matches
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame(self.to_dicts())
+
+    # Content hash, e.g. as a memoization key
+    def digest(self):
+        h = hashlib.sha256()
+        for field in MATCH_FIELDS:
+            h.update(self.codes[field].tobytes())
+        h.update(json.dumps(self.strings).encode("utf-8"))
+        h.update(json.dumps(self.extras, sort_keys=True, default=str).encode("utf-8"))
+        return h.hexdigest()
+
+    # Ranking and gender of the first match, as in the dict format
+    def player_profile(self):
+        return self._value(0, "classement_joueur"), self._value(0, "genre")
+
+    # Same (weights, scores) as backend.compute_match_weights on the dicts
+    def match_weights(self, rules=None):
+        codes = self.codes
+        for field in ("resultat", "phase", "type_competition", *RANKING_FIELDS):
+            missing = np.flatnonzero(codes[field] == MISSING)
+            if len(missing):
+                # The unknown value, or the name of the absent field
+                raise KeyError(self.extras.get(int(missing[0]), {}).get(field, field))
+
+        phase_win, phase_loss, competition = (
+            _DEFAULT_FACTORS
+            if rules is None or rules is DEFAULT_RULES
+            else factor_arrays(
+                rules, PHASES, COMPETITIONS, codes["phase"], codes["type_competition"]
+            )
+        )
+        victories = codes["resultat"] == RESULTS.index("Victoire")
+        phase_factor = np.where(
+            victories, phase_win[codes["phase"]], phase_loss[codes["phase"]]
+        )
+        return combine_match_weights(
+            victories,
+            phase_factor,
+            competition[codes["type_competition"]],
+            *(codes[field].astype(np.intp) for field in RANKING_FIELDS),
+        )
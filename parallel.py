@@ -0,0 +1,209 @@
+# ---------- parallel.py ----------
+# Multi-core batch mode: players are split in shards computed by a process
+# pool, for one or several candidate rule sets (see backend.make_rules).
+# The matches are encoded once as small integer codes in a .npy file that the
+# workers memory-map, so only row offsets and per-player labels are pickled.
+# Rows are grouped by player in their original order and the shards are
+# reassembled in order: the output is identical to compute_win_ratio_batch.
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from backend import (
+    DEFAULT_RULES,
+    combine_match_weights,
+    encode_factor_names,
+    factor_arrays,
+    ladder_indices,
+    recommend_players,
+)
+
+# One row per match, in player order
+ROW_DTYPE = np.dtype(
+    [
+        ("victory", np.bool_),
+        ("phase", np.int8),
+        ("competition", np.int8),
+        ("player", np.int8),
+        ("partner", np.int8),
+        ("opp1", np.int8),
+        ("opp2", np.int8),
+    ]
+)
+
+# Shards per worker, smaller shards balance the load between workers
+SHARDS_PER_WORKER = 4
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+# Encode the matches as ROW_DTYPE rows grouped by player (stable, so each
+# player keeps the order of their matches) and return the player table
+def encode_matches(df, key="numero_affiliation"):
+    df = df[df[key].notna()]
+    results = df["resultat"].str.lower()
+    unknown = ~results.isin(["victoire", "défaite"])
+    if unknown.any():
+        raise KeyError(results[unknown].iloc[0])
+
+    codes, players = pd.factorize(df[key])
+    phase_codes, phases, competition_codes, competitions = encode_factor_names(df)
+
+    rows = np.empty(len(df), dtype=ROW_DTYPE)
+    rows["victory"] = (results == "victoire").to_numpy()
+    rows["phase"] = phase_codes
+    rows["competition"] = competition_codes
+    rows["player"] = ladder_indices(df["classement_joueur"])
+    rows["partner"] = ladder_indices(df["classement_partenaire"])
+    rows["opp1"] = ladder_indices(df["classement_adversaire_1"])
+    rows["opp2"] = ladder_indices(df["classement_adversaire_2"])
+
+    order = np.argsort(codes, kind="stable")
+    counts = np.bincount(codes, minlength=len(players))
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    first_rows = df.groupby(codes, sort=False).head(1)
+    return {
+        "rows": rows[order],
+        "offsets": offsets,
+        "players": players,
+        "phases": phases,
+        "competitions": competitions,
+        "categories": ["P" + str(r) for r in first_rows["classement_joueur"]],
+        "genders": first_rows["genre"].tolist(),
+    }
+
+
+# Contiguous player ranges [start, end) with about the same number of matches
+def make_shards(offsets, n_shards):
+    n_players = len(offsets) - 1
+    if n_players == 0:
+        return []
+    targets = np.linspace(0, offsets[-1], n_shards + 1)[1:-1]
+    bounds = np.searchsorted(offsets, targets)
+    bounds = np.unique(np.concatenate([[0], bounds, [n_players]]))
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+# Worker: ratios and recommendations of the players of one shard, per rule set
+def compute_shard(path, offsets, categories, genders, rule_sets):
+    rows = np.load(path, mmap_mode="r")[offsets[0] : offsets[-1]]
+    counts = np.diff(offsets)
+    codes = np.repeat(np.arange(len(counts)), counts)
+    victories = rows["victory"]
+    indices = [rows[f].astype(np.intp) for f in ("player", "partner", "opp1", "opp2")]
+
+    outputs = []
+    for rules, (phase_win, phase_loss, competition) in rule_sets:
+        phase_factor = np.where(
+            victories, phase_win[rows["phase"]], phase_loss[rows["phase"]]
+        )
+        weights, scores = combine_match_weights(
+            victories, phase_factor, competition[rows["competition"]], *indices
+        )
+        total_points = np.zeros(len(counts))
+        total_weights = np.zeros(len(counts))
+        np.add.at(total_points, codes, scores)
+        np.add.at(total_weights, codes, weights)
+        outputs.append(
+            recommend_players(
+                total_points, total_weights, counts, categories, genders, rules
+            )
+        )
+    return outputs
+
+
+def _run_shard(task):
+    return compute_shard(*task)
+
+
+# Results of every rule set: {name: DataFrame like compute_win_ratio_batch}.
+# progress(done, total, start, end) is called in the parent process when a
+# shard of players [start, end) is finished.
+def compare_rule_sets(
+    df,
+    rule_sets,
+    key="numero_affiliation",
+    workers=None,
+    shards=None,
+    progress=None,
+):
+    workers = workers or default_workers()
+    encoded = encode_matches(df, key)
+    names = list(rule_sets)
+    lookups = [
+        (
+            rule_sets[name],
+            factor_arrays(rule_sets[name], encoded["phases"], encoded["competitions"]),
+        )
+        for name in names
+    ]
+    offsets = encoded["offsets"]
+    player_ranges = make_shards(offsets, shards or workers * SHARDS_PER_WORKER)
+
+    with tempfile.TemporaryDirectory(prefix="aft_parallel_") as tmp:
+        path = os.path.join(tmp, "matches.npy")
+        np.save(path, encoded["rows"])
+
+        tasks = [
+            (
+                path,
+                offsets[start : end + 1],
+                encoded["categories"][start:end],
+                encoded["genders"][start:end],
+                lookups,
+            )
+            for start, end in player_ranges
+        ]
+        outputs = [None] * len(tasks)
+        if workers == 1:
+            for i, task in enumerate(tasks):
+                outputs[i] = _run_shard(task)
+                if progress:
+                    progress(i + 1, len(tasks), *player_ranges[i])
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(_run_shard, t): i for i, t in enumerate(tasks)}
+                for done, future in enumerate(as_completed(futures), start=1):
+                    i = futures[future]
+                    outputs[i] = future.result()
+                    if progress:
+                        progress(done, len(tasks), *player_ranges[i])
+
+    match_counts = np.diff(offsets)
+    results = {}
+    for r, name in enumerate(names):
+        # Shards in player order, whatever the order they finished in
+        ratios = [ratio for output in outputs for ratio in output[r][0]]
+        recommendations = [rec for output in outputs for rec in output[r][1]]
+        results[name] = pd.DataFrame(
+            {
+                key: encoded["players"],
+                "ratio": ratios,
+                "nombre_matchs": match_counts,
+                "categorie": encoded["categories"],
+                "genre": encoded["genders"],
+                "recommandation": recommendations,
+            }
+        )
+    return results
+
+
+# Parallel equivalent of compute_win_ratio_batch
+def compute_win_ratio_parallel(
+    df, key="numero_affiliation", rules=None, workers=None, shards=None, progress=None
+):
+    results = compare_rule_sets(
+        df,
+        {"default": rules or DEFAULT_RULES},
+        key=key,
+        workers=workers,
+        shards=shards,
+        progress=progress,
+    )
+    return results["default"]
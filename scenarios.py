@@ -0,0 +1,241 @@
+# ---------- scenarios.py ----------
+# "What do I need to move up" solver.
+# From the running totals of the played matches (points, weights) and a list
+# of hypothetical future matches, it answers:
+#   - the minimum number of wins needed to reach up1 / up2, and the number of
+#     losses that would make the ratio fall under the drop threshold;
+#   - the probability of crossing each threshold for a given win rate.
+# Once every future match is played, ratio > t is a linear condition on the
+# won matches: sum(v_i * (1 - t) + d_i * t) > t * (W + sum(d_i)) - P, where v_i
+# and d_i are the weights of match i if won or lost. Minimum wins are then
+# prefix sums of the sorted scores, and probabilities a DP over their sum.
+import numpy as np
+import pandas as pd
+
+from backend import (
+    REQUIRED_MATCHES,
+    REQUIRED_MATCHES_UP2,
+    compute_match_weights,
+    player_totals,
+    ranking_thresholds,
+)
+
+# Resolution of the probability DP on the sum of match scores
+DP_RESOLUTION = 1e-4
+
+PROFILE_COLUMNS = [
+    "type_competition",
+    "phase",
+    "classement_partenaire",
+    "classement_adversaire_1",
+    "classement_adversaire_2",
+]
+
+
+# Running totals of the played matches of one player
+def current_totals(df: pd.DataFrame, rules=None) -> dict:
+    weights, scores = compute_match_weights(df, rules)
+    return {
+        "points": float(np.cumsum(scores)[-1]) if len(scores) else 0.0,
+        "weights": float(np.cumsum(weights)[-1]) if len(weights) else 0.0,
+        "match_count": len(df),
+        "player_ranking": df["classement_joueur"].iloc[0],
+        "category": "P" + str(df["classement_joueur"].iloc[0]),
+        "gender": df["genre"].iloc[0],
+    }
+
+
+# Weights of each future match if won (v) and if lost (d)
+def profile_weights(profiles, player_ranking, rules=None):
+    frame = pd.DataFrame(list(profiles), columns=PROFILE_COLUMNS)
+    frame["classement_joueur"] = player_ranking
+    won, _ = compute_match_weights(frame.assign(resultat="Victoire"), rules)
+    lost, _ = compute_match_weights(frame.assign(resultat="Défaite"), rules)
+    return won, lost
+
+
+# Rounded ratio (as displayed) strictly above / below a threshold in %
+def _crossing_level(threshold, above):
+    return (threshold + 0.005) / 100 if above else (threshold - 0.005) / 100
+
+
+def _scores(won, lost, level):
+    return won * (1 - level) + lost * level
+
+
+def _ratio(points, weights):
+    return round(points / weights * 100, 2) if weights else 0.0
+
+
+# Minimum number of wins among the future matches to get a ratio above
+# `threshold`, choosing the most valuable matches first (None if unreachable)
+def min_wins_to_exceed(points, weights, won, lost, threshold):
+    level = _crossing_level(threshold, above=True)
+    scores = _scores(won, lost, level)
+    needed = level * (weights + lost.sum()) - points
+    order = np.argsort(-scores, kind="stable")
+    cumulative = np.concatenate([[0.0], np.cumsum(scores[order])])
+    reachable = np.nonzero(cumulative >= needed)[0]
+    if len(reachable) == 0:
+        return None
+    wins = int(reachable[0])
+    # Guard against float noise around the boundary with the real ratio
+    while wins <= len(won):
+        chosen = order[:wins]
+        ratio = _ratio(
+            points + won[chosen].sum(),
+            weights + won[chosen].sum() + lost.sum() - lost[chosen].sum(),
+        )
+        if ratio > threshold:
+            return wins
+        wins += 1
+    return None
+
+
+# Minimum number of losses among the future matches for the ratio to fall
+# under `threshold`, losing the most costly matches first (None if it cannot)
+def min_losses_to_fall_below(points, weights, won, lost, threshold):
+    level = _crossing_level(threshold, above=False)
+    scores = _scores(won, lost, level)
+    needed = level * (weights + lost.sum()) - points
+    # Keep the wins with the smallest scores: losses are the largest scores
+    order = np.argsort(scores, kind="stable")
+    cumulative = np.concatenate([[0.0], np.cumsum(scores[order])])
+    n = len(won)
+    for losses in range(n + 1):
+        wins = n - losses
+        if cumulative[wins] < needed:
+            kept = order[:wins]
+            ratio = _ratio(
+                points + won[kept].sum(),
+                weights + won[kept].sum() + lost.sum() - lost[kept].sum(),
+            )
+            if ratio < threshold:
+                return losses
+    return None
+
+
+# Distribution of the sum of the scores of the won matches (in grid steps),
+# each match being won independently with its probability. Only the sums
+# under `cutoff` are tracked one by one, the others are gathered in `over`.
+def _score_sum_distribution(steps, win_rates, cutoff):
+    if cutoff <= 0:
+        return np.zeros(0), 1.0
+    below = np.zeros(cutoff)
+    below[0] = 1.0
+    over = 0.0
+    filled = 1
+    for step, p in zip(steps.tolist(), win_rates.tolist()):
+        won = p * below[:filled]
+        below[:filled] *= 1 - p
+        end = min(filled + step, cutoff)
+        if step < end:
+            below[step:end] += won[: end - step]
+        over += won[max(cutoff - step, 0) :].sum()
+        filled = end
+    return below, over
+
+
+def crossing_probability(points, weights, won, lost, threshold, win_rate, above):
+    level = _crossing_level(threshold, above)
+    scores = _scores(won, lost, level)
+    needed = level * (weights + lost.sum()) - points
+    win_rates = np.broadcast_to(np.asarray(win_rate, dtype=float), scores.shape)
+    steps = np.rint(scores / DP_RESOLUTION).astype(np.int64)
+    # Common divisor of the steps (e.g. repeated profiles): smaller grid
+    resolution = DP_RESOLUTION
+    divisor = int(np.gcd.reduce(steps)) if len(steps) else 1
+    if divisor > 1:
+        steps //= divisor
+        resolution *= divisor
+    # First grid index reaching the needed sum
+    cutoff = min(max(int(np.ceil(needed / resolution)), 0), int(steps.sum()) + 1)
+    below, over = _score_sum_distribution(steps, win_rates, cutoff)
+    return float(over) if above else float(below.sum())
+
+
+# Full answer for one player: current ratio, minimum wins / losses and,
+# when a win rate is given, the probability of each outcome. `rules` are those
+# of generate_recommendation, current_totals takes the same ones.
+def solve_scenarios(totals, profiles, win_rate=None, rules=None):
+    won, lost = profile_weights(profiles, totals["player_ranking"], rules)
+    return _solve(totals, won, lost, win_rate, rules)
+
+
+def _solve(totals, won, lost, win_rate, rules):
+    limits = ranking_thresholds(totals["category"], totals["gender"], rules)
+    final_count = totals["match_count"] + len(won)
+    points, weights = totals["points"], totals["weights"]
+
+    result = {
+        "ratio": _ratio(points, weights),
+        "future_matches": len(won),
+        "match_count_after": final_count,
+        "thresholds": limits,
+    }
+    if limits is None or final_count < REQUIRED_MATCHES:
+        # No recommendation possible (unknown category or not enough matches)
+        return result
+
+    targets = {"up1": limits["up1"]}
+    if limits["up2"] < 100 and final_count >= REQUIRED_MATCHES_UP2:
+        targets["up2"] = limits["up2"]
+
+    for name, threshold in targets.items():
+        result[f"min_wins_{name}"] = (
+            min_wins_to_exceed(points, weights, won, lost, threshold)
+            if threshold < 100
+            else None
+        )
+    result["min_losses_drop"] = min_losses_to_fall_below(
+        points, weights, won, lost, limits["drop"]
+    )
+
+    if win_rate is not None:
+        for name, threshold in targets.items():
+            result[f"probability_{name}"] = (
+                crossing_probability(
+                    points, weights, won, lost, threshold, win_rate, above=True
+                )
+                if threshold < 100
+                else 0.0
+            )
+        result["probability_drop"] = crossing_probability(
+            points, weights, won, lost, limits["drop"], win_rate, above=False
+        )
+    return result
+
+
+# Same for every player of a long match table (e.g. a whole club)
+def solve_scenarios_batch(
+    df, profiles, win_rate=None, key="numero_affiliation", rules=None
+):
+    profiles = list(profiles)
+    # Running totals of all players at once, as in compute_win_ratio_batch
+    sums = player_totals(df, key, rules)
+
+    # The future match weights only depend on the player's ranking
+    weights_by_ranking = {}
+    rows = []
+    for player, points, weight, count, ranking, gender in zip(
+        sums.players,
+        sums.total_points.tolist(),
+        sums.total_weights.tolist(),
+        sums.match_counts.tolist(),
+        sums.first_rows["classement_joueur"].tolist(),
+        sums.first_rows["genre"].tolist(),
+    ):
+        if ranking not in weights_by_ranking:
+            weights_by_ranking[ranking] = profile_weights(profiles, ranking, rules)
+        totals = {
+            "points": points,
+            "weights": weight,
+            "match_count": count,
+            "player_ranking": ranking,
+            "category": "P" + str(ranking),
+            "gender": gender,
+        }
+        result = _solve(totals, *weights_by_ranking[ranking], win_rate, rules)
+        result.pop("thresholds")
+        rows.append(dict({key: player}, **result))
+    return pd.DataFrame(rows)
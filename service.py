@@ -0,0 +1,216 @@
+# ---------- service.py ----------
+# Local HTTP service for the other tools (club dashboards, lineup bot, ...):
+# ratio, curve and recommendation of a batch of players, JSON in and out.
+# Usage: python service.py [--host 127.0.0.1] [--port 8502] [--workers 8]
+#
+#   POST /ratios  {"players": ["1234567", {"numero_affiliation": "7654321",
+#                  "matches": [...]}], "curve": true}
+#   GET  /health
+#   GET  /metrics (Prometheus text, see timing.to_prometheus)
+#
+# A player given by its affiliation number is fetched from TPPWB through the
+# shared response cache (cache.py), a player given with "matches" (format of
+# tppwb_matches and of the JSON files of the app) is computed as is.
+# The players of a request are computed on a thread pool shared by all
+# requests; each request is answered in the order of its players.
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend import compute_ratio_curve, compute_win_ratio_vectorized
+from bulk_fetch import fetch_player
+from cache import get_cache
+from matchtable import MatchTable
+from timing import span, start_recording, stop_recording, to_prometheus
+from tppwb import get_client
+
+DEFAULT_PORT = 8502
+DEFAULT_WORKERS = 8
+
+# Players per request, larger batches are refused
+MAX_PLAYERS = 1000
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+
+class RequestError(ValueError):
+    pass
+
+
+def compute_player(player, curve=False, client=None):
+    if isinstance(player, dict):
+        affiliation_number = player.get("numero_affiliation")
+        matches = player.get("matches")
+    else:
+        affiliation_number = player
+        matches = None
+
+    result = {
+        "numero_affiliation": (
+            None if affiliation_number is None else str(affiliation_number)
+        ),
+        "ratio": None,
+        "nombre_matchs": 0,
+        "recommandation": None,
+        "changement_categorie": False,
+        "erreur": None,
+    }
+    try:
+        if matches is None:
+            if affiliation_number is None:
+                raise RequestError("numero_affiliation ou matches manquant")
+            with span("service.fetch"):
+                fetched = fetch_player(
+                    str(affiliation_number), client or get_client(), False
+                )
+            if fetched["error"]:
+                result["erreur"] = fetched["error"]
+                return result
+            matches = fetched["matches"]
+            result["changement_categorie"] = fetched["category_change"]
+
+        with span("service.compute"):
+            table = MatchTable.from_dicts(matches)
+            result["nombre_matchs"] = len(table)
+            if len(table) == 0:
+                result["ratio"] = 0.0
+                result["recommandation"] = "Pas de matchs valides."
+            else:
+                result["ratio"], result["recommandation"] = (
+                    compute_win_ratio_vectorized(table)[:2]
+                )
+            if curve:
+                result["courbe"] = compute_ratio_curve(table)
+    except Exception as e:
+        result["erreur"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+# Spans are recorded in the thread that computes the player, their process
+# totals are exported by /metrics
+def _compute_recorded(player, curve, client):
+    start_recording()
+    try:
+        return compute_player(player, curve, client)
+    finally:
+        stop_recording()
+
+
+def compute_players(players, curve=False, executor=None, client=None):
+    if executor is None:
+        return [_compute_recorded(p, curve, client) for p in players]
+    return list(executor.map(lambda p: _compute_recorded(p, curve, client), players))
+
+
+def parse_request(body):
+    try:
+        request = json.loads(body)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise RequestError(f"JSON invalide : {e}")
+    if not isinstance(request, dict) or not isinstance(request.get("players"), list):
+        raise RequestError('Le corps doit être un objet {"players": [...]}')
+    if len(request["players"]) > MAX_PLAYERS:
+        raise RequestError(f"Maximum {MAX_PLAYERS} joueurs par requête")
+    return request["players"], bool(request.get("curve", False))
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    # Keep-alive connections: clients send many small requests
+    protocol_version = "HTTP/1.1"
+    server_version = "AFTRatioService"
+    # Headers and body are written separately: no Nagle delay between them
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            cache = get_cache()
+            body = to_prometheus(cache.stats() if cache else None)
+            self._send(200, body.encode("utf-8"), "text/plain; version=0.0.4")
+        else:
+            self._send_json(404, {"erreur": f"Chemin inconnu : {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/ratios":
+            self._send_json(404, {"erreur": f"Chemin inconnu : {self.path}"})
+            return
+        header = self.headers.get("Content-Length")
+        if header is None:
+            self.close_connection = True
+            self._send_json(411, {"erreur": "En-tête Content-Length manquant"})
+            return
+        # The body cannot be skipped without a valid length: close afterwards
+        if not (header.isascii() and header.strip().isdigit()):
+            self.close_connection = True
+            self._send_json(400, {"erreur": f"Content-Length invalide : {header!r}"})
+            return
+        length = int(header)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send_json(413, {"erreur": "Requête trop volumineuse"})
+            return
+        try:
+            players, curve = parse_request(self.rfile.read(length))
+        except RequestError as e:
+            self._send_json(400, {"erreur": str(e)})
+            return
+        results = compute_players(players, curve, self.server.executor)
+        self._send_json(200, {"results": results})
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self._send(status, body, "application/json; charset=utf-8")
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # One line per request is too much at hundreds of requests per second
+        pass
+
+
+class ComputeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Many clients connecting at once
+    request_queue_size = 128
+
+    def __init__(self, address, workers=DEFAULT_WORKERS):
+        super().__init__(address, ServiceHandler)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Service HTTP de calcul du ratio de victoire (JSON)"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="Nombre de joueurs calculés en parallèle",
+    )
+    args = parser.parse_args(argv)
+
+    server = ComputeServer((args.host, args.port), workers=args.workers)
+    print(f"Service prêt sur http://{args.host}:{server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
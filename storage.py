@@ -0,0 +1,274 @@
+# ---------- storage.py ----------
+# Columnar store of normalized matches (output of tppwb_matches) as a Parquet
+# dataset partitioned by semester ("semestre=2026H1/...").
+# Inside each file the rows are sorted by affiliation number and date, so the
+# row group statistics let reads skip everything outside the requested
+# players, dates and categories.
+import datetime
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+from backend import compute_match_weights, summarize_players
+from tppwb import IDENTITY_FIELDS
+
+MATCH_SCHEMA = pa.schema(
+    [
+        ("numero_affiliation", pa.string()),
+        ("date", pa.timestamp("s")),
+        ("genre", pa.string()),
+        ("resultat", pa.string()),
+        ("type_competition", pa.string()),
+        ("phase", pa.string()),
+        ("classement_joueur", pa.int32()),
+        ("classement_partenaire", pa.int32()),
+        ("classement_adversaire_1", pa.int32()),
+        ("classement_adversaire_2", pa.int32()),
+        ("categorie", pa.string()),
+        # Partner and opponents, null in matches stored without them
+        *((field, pa.string()) for field in IDENTITY_FIELDS),
+        ("semestre", pa.string()),
+    ]
+)
+
+PARTITIONING = ds.partitioning(pa.schema([("semestre", pa.string())]), flavor="hive")
+
+# Columns needed by the ratio computation
+RATIO_COLUMNS = [
+    "numero_affiliation",
+    "genre",
+    "resultat",
+    "type_competition",
+    "phase",
+    "classement_joueur",
+    "classement_partenaire",
+    "classement_adversaire_1",
+    "classement_adversaire_2",
+]
+
+ROWS_PER_GROUP = 64 * 1024
+
+
+def semester_label(date):
+    return f"{date.year}H{1 if date.month <= 6 else 2}"
+
+
+# Matches of several players, as a DataFrame or as {affiliation_number: matches}
+def matches_to_table(matches):
+    if isinstance(matches, dict):
+        matches = pd.DataFrame(
+            [
+                dict(match, numero_affiliation=str(affiliation_number))
+                for affiliation_number, player_matches in matches.items()
+                for match in player_matches
+            ]
+        )
+    df = matches.copy()
+    df["numero_affiliation"] = df["numero_affiliation"].astype(str)
+    df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%dT%H:%M:%S")
+    df["semestre"] = [semester_label(d) for d in df["date"]]
+    for field in IDENTITY_FIELDS:
+        if field not in df:
+            df[field] = None
+    # Stable sort keeps the order of matches played at the same time
+    df = df.sort_values(["numero_affiliation", "date"], kind="stable")
+    return pa.Table.from_pandas(
+        df[MATCH_SCHEMA.names], schema=MATCH_SCHEMA, preserve_index=False
+    )
+
+
+# mode "append" adds files next to the existing ones, "overwrite" replaces
+# the semesters present in the written matches (for every player) and
+# "upsert" replaces all the stored matches of the written players only,
+# e.g. to refresh one club
+def write_matches(root, matches, mode="append"):
+    table = matches_to_table(matches)
+    if mode == "upsert":
+        table, emptied = _upsert_table(root, table)
+        for semester in emptied:
+            shutil.rmtree(os.path.join(root, f"semestre={semester}"))
+        mode = "overwrite"
+    ds.write_dataset(
+        table,
+        root,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior=(
+            "delete_matching" if mode == "overwrite" else "overwrite_or_ignore"
+        ),
+        min_rows_per_group=min(ROWS_PER_GROUP, max(len(table), 1)),
+        max_rows_per_group=ROWS_PER_GROUP,
+    )
+
+
+# The matches of the semesters where the written players have matches (stored
+# or new), with their stored matches replaced by the new ones. The whole
+# semester partitions are rewritten: Parquet files cannot be edited in place.
+# Also returns the semesters left without any match.
+def _upsert_table(root, table):
+    if not os.path.isdir(root):
+        return table, []
+    players = pc.unique(table["numero_affiliation"])
+    dataset = open_dataset(root)
+    stored_semesters = pc.unique(
+        dataset.to_table(
+            columns=["semestre"], filter=pc.field("numero_affiliation").isin(players)
+        )["semestre"]
+    )
+    semesters = pc.unique(
+        pa.concat_arrays([stored_semesters, pc.unique(table["semestre"])])
+    )
+    kept = dataset.to_table(
+        filter=pc.field("semestre").isin(semesters)
+        & ~pc.field("numero_affiliation").isin(players)
+    )
+    merged = pa.concat_tables([kept.select(MATCH_SCHEMA.names).cast(MATCH_SCHEMA), table])
+    # Same order as matches_to_table (stable: equal dates keep their order)
+    merged = merged.sort_by([("numero_affiliation", "ascending"), ("date", "ascending")])
+    emptied = set(semesters.to_pylist()) - set(pc.unique(merged["semestre"]).to_pylist())
+    return merged, sorted(emptied)
+
+
+def open_dataset(root):
+    # Memory-mapped reads: pages are loaded on demand by the OS.
+    # The schema also reads files written before a column was added (nulls).
+    return ds.dataset(
+        root,
+        schema=MATCH_SCHEMA,
+        format="parquet",
+        partitioning=PARTITIONING,
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def build_filter(
+    affiliation_numbers=None, date_from=None, date_to=None, categories=None
+):
+    conditions = []
+    if affiliation_numbers is not None:
+        conditions.append(
+            pc.field("numero_affiliation").isin([str(n) for n in affiliation_numbers])
+        )
+    if date_from is not None:
+        conditions.append(pc.field("semestre") >= semester_label(date_from))
+        conditions.append(
+            pc.field("date") >= pa.scalar(_as_datetime(date_from), pa.timestamp("s"))
+        )
+    if date_to is not None:
+        conditions.append(pc.field("semestre") <= semester_label(date_to))
+        conditions.append(
+            pc.field("date")
+            <= pa.scalar(_as_datetime(date_to, end_of_day=True), pa.timestamp("s"))
+        )
+    if categories is not None:
+        conditions.append(pc.field("categorie").isin(list(categories)))
+    if not conditions:
+        return None
+    expression = conditions[0]
+    for condition in conditions[1:]:
+        expression = expression & condition
+    return expression
+
+
+# A date bound covers the whole day
+def _as_datetime(value, end_of_day=False):
+    if isinstance(value, datetime.datetime):
+        return value
+    if end_of_day:
+        return datetime.datetime.combine(value, datetime.time(23, 59, 59))
+    return datetime.datetime.combine(value, datetime.time())
+
+
+def scan_batches(root, columns=None, **filters):
+    dataset = open_dataset(root)
+    scanner = dataset.scanner(columns=columns, filter=build_filter(**filters))
+    # Rows are sorted by player and date inside each file, but the files of
+    # a semester (one per append, with random names) come in path order: the
+    # matches of a player are not in date order across files
+    return scanner.to_batches()
+
+
+# Matches sorted by player and date (stable: matches played at the same time
+# keep their order), whatever the order of the appended files
+def read_matches(root, columns=None, **filters) -> pd.DataFrame:
+    dataset = open_dataset(root)
+    table = dataset.to_table(columns=columns, filter=build_filter(**filters))
+    sort_keys = [
+        (name, "ascending")
+        for name in ("numero_affiliation", "date")
+        if name in table.column_names
+    ]
+    if sort_keys:
+        table = table.sort_by(sort_keys)
+    return table.to_pandas()
+
+
+# Batch ratio computation over the store, one record batch at a time:
+# only the running totals per player are kept in memory. The category and
+# gender of a player come from their earliest match, wherever it is scanned.
+def compute_win_ratio_from_store(root, key="numero_affiliation", **filters):
+    player_codes = {}
+    players = []
+    categories = []
+    genders = []
+    first_dates = []
+    total_points = np.zeros(0)
+    total_weights = np.zeros(0)
+    match_counts = np.zeros(0, dtype=np.int64)
+
+    columns = [*RATIO_COLUMNS, "date"]
+    if key not in columns:
+        columns.append(key)
+    for batch in scan_batches(root, columns=columns, **filters):
+        if batch.num_rows == 0:
+            continue
+        df = batch.to_pandas()
+        weights, scores = compute_match_weights(df)
+        local_codes, local_players = pd.factorize(df[key])
+
+        # Earliest match of each player in the batch (the first one on ties)
+        first_rows = df.loc[df.groupby(local_codes, sort=False)["date"].idxmin()]
+        mapping = np.empty(len(local_players), dtype=np.int64)
+        for i, (player, rank, gender, date) in enumerate(
+            zip(
+                local_players,
+                first_rows["classement_joueur"],
+                first_rows["genre"],
+                first_rows["date"],
+            )
+        ):
+            code = player_codes.get(player)
+            if code is None:
+                code = player_codes[player] = len(players)
+                players.append(player)
+                categories.append(None)
+                genders.append(None)
+                first_dates.append(None)
+            if first_dates[code] is None or date < first_dates[code]:
+                categories[code] = "P" + str(rank)
+                genders[code] = gender
+                first_dates[code] = date
+            mapping[i] = code
+
+        if len(players) > len(total_points):
+            grow = len(players) - len(total_points)
+            total_points = np.concatenate([total_points, np.zeros(grow)])
+            total_weights = np.concatenate([total_weights, np.zeros(grow)])
+            match_counts = np.concatenate([match_counts, np.zeros(grow, np.int64)])
+
+        codes = mapping[local_codes]
+        np.add.at(total_points, codes, scores)
+        np.add.at(total_weights, codes, weights)
+        np.add.at(match_counts, codes, 1)
+
+    return summarize_players(
+        players, total_points, total_weights, match_counts, categories, genders, key
+    )
@@ -0,0 +1,96 @@
+# ---------- streaming.py ----------
+# Incremental parsing of large JSON arrays (TPPWB responses, match files).
+# Elements are decoded one at a time from a rolling buffer, so memory stays
+# proportional to the largest element instead of the whole payload.
+import codecs
+import json
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+# Characters that can follow a complete element of the array
+_DELIMITERS = _WHITESPACE + ",]"
+_decoder = json.JSONDecoder()
+
+
+def _skip_whitespace(buffer, pos):
+    while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+# Yield the elements of a top-level JSON array given as chunks of str or bytes
+def iter_json_array_chunks(chunks):
+    utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+    chunks = iter(chunks)
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def read_more():
+        nonlocal buffer, pos, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            buffer = buffer[pos:] + utf8.decode(b"", final=True)
+        else:
+            if isinstance(chunk, bytes):
+                chunk = utf8.decode(chunk)
+            buffer = buffer[pos:] + chunk
+        pos = 0
+
+    # Opening bracket
+    while True:
+        pos = _skip_whitespace(buffer, pos)
+        if pos < len(buffer) or eof:
+            break
+        read_more()
+    if pos >= len(buffer) or buffer[pos] != "[":
+        raise ValueError("Le contenu JSON n'est pas une liste.")
+    pos += 1
+
+    expect_value = True
+    first = True
+    while True:
+        pos = _skip_whitespace(buffer, pos)
+        if pos >= len(buffer):
+            if eof:
+                raise ValueError("Liste JSON incomplète.")
+            read_more()
+            continue
+
+        if buffer[pos] == "]" and (first or not expect_value):
+            return
+        if not expect_value:
+            if buffer[pos] != ",":
+                raise ValueError(f"Caractère inattendu dans la liste JSON : {buffer[pos]!r}")
+            pos += 1
+            expect_value = True
+            continue
+
+        try:
+            value, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            read_more()
+            continue
+        # A value is only complete when followed by a delimiter: a number cut
+        # by a chunk boundary ("0." then "5") decodes as its first part
+        if not eof and (end == len(buffer) or buffer[end] not in _DELIMITERS):
+            read_more()
+            continue
+        pos = end
+        expect_value = False
+        first = False
+        yield value
+
+
+# Same, reading from a binary or text file object
+def iter_json_array(stream, chunk_size=CHUNK_SIZE):
+    return iter_json_array_chunks(iter(lambda: stream.read(chunk_size), stream.read(0)))
+
+
+def iter_json_file(path, chunk_size=CHUNK_SIZE):
+    with open(path, "rb") as stream:
+        yield from iter_json_array(stream, chunk_size)
@@ -0,0 +1,48 @@
+# ---------- tests/conftest.py ----------
+# The modules of the app are top-level files
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend import COMPETITION_FACTORS, PHASE_FACTORS, RANKS  # noqa: E402
+
+
+# Seeded random matches in the format of the app: one row per match, keyed
+# by affiliation number, in date order for each player. Rankings are drawn
+# on the ladder of the player's gender.
+def make_matches(n_players=1, matches_per_player=30, seed=0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    ranks = np.array(RANKS)
+    rows = []
+    for player in range(n_players):
+        women = rng.random() < 0.3
+        ladder = ranks[:6] if women else ranks[1:]
+        rank = int(rng.choice(ladder))
+        for i in range(int(rng.integers(1, 2 * matches_per_player))):
+            rows.append(
+                {
+                    "numero_affiliation": str(1000000 + player),
+                    "genre": "Dames" if women else "Messieurs",
+                    "resultat": "Victoire" if rng.random() < 0.5 else "Défaite",
+                    "type_competition": rng.choice(list(COMPETITION_FACTORS)),
+                    "phase": rng.choice(list(PHASE_FACTORS)),
+                    "classement_joueur": rank,
+                    "classement_partenaire": int(rng.choice(ladder)),
+                    "classement_adversaire_1": int(rng.choice(ladder)),
+                    "classement_adversaire_2": int(rng.choice(ladder)),
+                    "categorie": f"P{rank}",
+                    "date": f"2025-{1 + i // 28 % 12:02d}-{1 + i % 28:02d}T20:00:00",
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def matches():
+    return make_matches
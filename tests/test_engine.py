@@ -0,0 +1,85 @@
+# ---------- tests/test_engine.py ----------
+# The vectorized engines give exactly the values of the reference loop
+# compute_win_ratio, also without each match (leave-one-out impacts).
+import pandas as pd
+import pytest
+
+from backend import (
+    compute_match_impacts,
+    compute_match_impacts_batch,
+    compute_ratio_curve,
+    compute_win_ratio,
+    compute_win_ratio_batch,
+    compute_win_ratio_vectorized,
+)
+from parallel import compute_win_ratio_parallel
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_vectorized_matches_reference(matches, seed):
+    df = matches(seed=seed)
+    assert compute_win_ratio_vectorized(df) == compute_win_ratio(df)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_curve_matches_reference_on_each_prefix(matches, seed):
+    df = matches(seed=seed, matches_per_player=15)
+    ratios, recommendations = compute_ratio_curve(df, with_recommendations=True)
+    assert ratios == compute_ratio_curve(df)
+    for i in range(len(df)):
+        expected = compute_win_ratio(df.iloc[: i + 1])
+        assert ratios[i] == expected[0]
+        # The reference has no recommendation without valid matches
+        if len(expected) == 3:
+            assert recommendations[i] == expected[1]
+
+
+def test_batch_matches_reference_per_player(matches):
+    df = matches(n_players=30, matches_per_player=10, seed=1)
+    batch = compute_win_ratio_batch(df)
+    assert len(batch) == 30
+    for row in batch.itertuples(index=False):
+        player_matches = df[df["numero_affiliation"] == row.numero_affiliation]
+        ratio, recommendation = compute_win_ratio(player_matches)[:2]
+        assert (row.ratio, row.recommandation) == (ratio, recommendation)
+        assert row.nombre_matchs == len(player_matches)
+
+
+@pytest.mark.parametrize("workers, shards", [(1, 3), (2, 5)])
+def test_parallel_matches_batch(matches, workers, shards):
+    df = matches(200, 15, seed=2)
+    pd.testing.assert_frame_equal(
+        compute_win_ratio_parallel(df, workers=workers, shards=shards),
+        compute_win_ratio_batch(df),
+    )
+
+
+# Ratio and recommendation of the player without match i, by the reference
+def reference_without(df, i):
+    return compute_win_ratio(df.drop(index=df.index[i]))[:2]
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_impacts_match_reference_without_each_match(matches, seed):
+    df = matches(seed=seed, matches_per_player=12)
+    ratio = compute_win_ratio(df)[0]
+    impacts, ratios_without, recommendations_without = compute_match_impacts(df)
+    for i in range(len(df)):
+        expected_ratio, expected_recommendation = reference_without(df, i)
+        assert ratios_without[i] == expected_ratio
+        assert recommendations_without[i] == expected_recommendation
+        assert impacts[i] == round(ratio - expected_ratio, 2)
+
+
+def test_batch_impacts_match_reference(matches):
+    df = matches(n_players=25, matches_per_player=8, seed=6)
+    impacts = compute_match_impacts_batch(df)
+    assert len(impacts) == len(df)
+    for _, player in df.groupby("numero_affiliation", sort=False):
+        ratio = compute_win_ratio(player)[0]
+        rows = impacts.loc[player.index]
+        for i, row in enumerate(rows.itertuples()):
+            expected_ratio, expected_recommendation = reference_without(player, i)
+            assert row.ratio_sans_ce_match == expected_ratio
+            assert row.recommandation_sans_ce_match == expected_recommendation
+            assert row.impact_ratio == round(ratio - expected_ratio, 2)
@@ -0,0 +1,156 @@
+# ---------- tests/test_history.py ----------
+# Incremental syncs of the match history end with the results a full
+# download of the window would give.
+import datetime
+
+import pytest
+
+import cache
+import history as history_module
+from history import (
+    FULL_SYNC_INTERVAL,
+    MatchHistory,
+    main,
+    sync_player,
+    tppwb_matches_incremental,
+)
+from tppwb import filter_category_change, normalize_tppwb_data, previous_semester_start
+
+PLAYER = "1234567"
+TODAY = datetime.date(2026, 10, 17)
+
+
+def record(day, hour=20, score="6/4 6/3", partner="2000001"):
+    return {
+        "Date": f"{day.isoformat()}T{hour:02d}:00:00",
+        "Category": "MD200",
+        "VictoryOrDefeat": "V" if score.startswith("6") else "D",
+        "Score": score,
+        "DrawType": "P",
+        "TypeTab": "",
+        "DoublePairValue": "500",
+        "PartnerDoubleValue": "300",
+        "OpponentDoubleValue1": "200",
+        "OpponentDoubleValue2": "300",
+        "PartnerAffiliationNumber": partner,
+    }
+
+
+# GetResultsByPlayer over a list of results: the results played since
+# dateFrom (a day), in API order (most recent first)
+class FakeApi:
+    def __init__(self, records):
+        self.records = list(records)
+        self.dates_from = []
+
+    def get_json(self, path, params=None):
+        date_from = datetime.datetime.strptime(params["dateFrom"], "%d%m%Y").date()
+        self.dates_from.append(date_from)
+        return sorted(
+            (r for r in self.records if r["Date"] >= date_from.isoformat()),
+            key=lambda r: r["Date"],
+            reverse=True,
+        )
+
+    def close(self):
+        self.closed = True
+
+    # What a full download of the window of tppwb_matches returns
+    def window(self, today):
+        date_from = previous_semester_start(today).isoformat()
+        return sorted(
+            (r for r in self.records if r["Date"] >= date_from),
+            key=lambda r: r["Date"],
+        )
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(cache, "_cache", None)
+
+
+@pytest.fixture
+def history(tmp_path):
+    return MatchHistory(str(tmp_path / "historique.sqlite3"))
+
+
+def days_before(today, n):
+    return today - datetime.timedelta(days=n)
+
+
+def test_incremental_syncs(history):
+    api = FakeApi(
+        [record(days_before(TODAY, n)) for n in range(300, 0, -20)]
+        # Two identical results of the same day are both kept
+        + [record(days_before(TODAY, 5))]
+    )
+    records, added = sync_player(PLAYER, history, client=api, today=TODAY)
+    assert records == api.window(TODAY)
+    assert added == len(api.window(TODAY))
+    assert api.dates_from == [previous_semester_start(TODAY)]
+
+    # New results, and a correction on the high-water mark day
+    tomorrow = days_before(TODAY, -1)
+    api.records.remove(record(days_before(TODAY, 5)))
+    api.records += [record(days_before(TODAY, 5), score="4/6 3/6"), record(TODAY)]
+    records, added = sync_player(PLAYER, history, client=api, today=tomorrow)
+    assert api.dates_from[-1] == days_before(TODAY, 5)
+    assert records == api.window(tomorrow)
+    assert added == 2
+
+    # Nothing new: no record added
+    records, added = sync_player(PLAYER, history, client=api, today=tomorrow)
+    assert api.dates_from[-1] == TODAY
+    assert (records, added) == (api.window(tomorrow), 0)
+
+
+def test_older_edits_are_picked_up_by_the_full_sync(history):
+    old = record(days_before(TODAY, 40))
+    api = FakeApi([old, record(days_before(TODAY, 2))])
+    sync_player(PLAYER, history, client=api, today=TODAY)
+
+    # Partner corrected upstream, before the high-water mark
+    api.records[0] = record(days_before(TODAY, 40), partner="2000002")
+    records, _ = sync_player(PLAYER, history, client=api, today=TODAY)
+    assert old in records
+
+    later = TODAY + FULL_SYNC_INTERVAL
+    records, _ = sync_player(PLAYER, history, client=api, today=later)
+    assert api.dates_from[-1] == previous_semester_start(later)
+    assert records == api.window(later)
+
+
+def test_old_semesters_are_pruned(history):
+    api = FakeApi([record(datetime.date(2026, 2, 1)), record(TODAY)])
+    records, _ = sync_player(PLAYER, history, client=api, today=TODAY)
+    assert len(records) == 2
+    next_year = datetime.date(2027, 3, 1)
+    records, _ = sync_player(PLAYER, history, client=api, today=next_year)
+    assert records == [record(TODAY)]
+    assert history.records(PLAYER) == [record(TODAY)]
+
+
+def test_incremental_matches_equal_full_download(history):
+    today = datetime.date.today()
+    api = FakeApi([record(days_before(today, n), hour=n % 3 + 18) for n in range(200)])
+    expected = filter_category_change(
+        normalize_tppwb_data(api.window(today)), today, previous_semester_start(today)
+    )
+    assert tppwb_matches_incremental(PLAYER, history, client=api) == expected
+    assert tppwb_matches_incremental(PLAYER, history, client=api) == expected
+
+
+def test_command_line(tmp_path, monkeypatch, capsys):
+    today = datetime.date.today()
+    api = FakeApi([record(days_before(today, n)) for n in (30, 10, 1)])
+    monkeypatch.setattr(history_module, "TppwbClient", lambda: api)
+    path = str(tmp_path / "historique.sqlite3")
+
+    assert main([PLAYER, PLAYER, "--history", path]) == 0
+    assert capsys.readouterr().out == f"{PLAYER} : 3 nouveaux résultats, 3 au total\n"
+    assert api.closed
+    assert MatchHistory(path).records(PLAYER) == api.window(today)
+    # No new result: only the high-water mark day is requested again
+    assert main([PLAYER, "--history", path]) == 0
+    assert api.dates_from[-1] == days_before(today, 1)
+    assert capsys.readouterr().out == f"{PLAYER} : 0 nouveaux résultats, 3 au total\n"
@@ -0,0 +1,65 @@
+# ---------- tests/test_matchtable.py ----------
+# MatchTable converts from and to the dict format of tppwb_matches without
+# loss, and gives the weights of backend.compute_match_weights.
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend import compute_match_weights
+from matchtable import MatchTable
+
+# Values without an exact code, kept in the extras of the table
+ODD_MATCHES = [
+    {"resultat": "victoire", "genre": "dames", "phase": "Poule"},
+    {"classement_joueur": 100.0, "classement_partenaire": 150},
+    {"type_competition": "Coupe", "categorie": 200, "date": "2026-03-01"},
+    {"date": "pas une date", "nom_partenaire": None, "commentaire": "manuel"},
+    {},
+]
+
+
+# Matches of one player in the dict format of tppwb_matches (plain Python
+# values, no affiliation number)
+def match_dicts(df):
+    df = df.drop(columns="numero_affiliation")
+    return json.loads(df.to_json(orient="records", force_ascii=False))
+
+
+def test_round_trip(matches):
+    dicts = match_dicts(matches(n_players=3, seed=3))
+    dicts[0]["affiliation_partenaire"] = "1000123"
+    dicts[1]["nom_adversaire_2"] = "Adversaire"
+    dicts.extend(ODD_MATCHES)
+    table = MatchTable.from_dicts(dicts)
+    assert len(table) == len(dicts)
+    assert table.to_dicts() == dicts
+    # Only the odd values are kept in extras
+    assert sorted(table.extras) == list(range(len(dicts) - 5, len(dicts) - 1))
+
+
+def test_slices_and_concat(matches):
+    dicts = match_dicts(matches(seed=4)) + ODD_MATCHES
+    table = MatchTable.from_dicts(dicts)
+    assert table[:-3].to_dicts() == dicts[:-3]
+    assert table[5:].to_dicts() == dicts[5:]
+    assert table[:4].concat(table[4:]).to_dicts() == dicts
+    assert table[:4].digest() == MatchTable.from_dicts(dicts[:4]).digest()
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_weights_match_engine(matches, seed):
+    df = matches(seed=seed)
+    weights, scores = MatchTable.from_dicts(match_dicts(df)).match_weights()
+    expected_weights, expected_scores = compute_match_weights(df)
+    np.testing.assert_array_equal(weights, expected_weights)
+    np.testing.assert_array_equal(scores, expected_scores)
+
+
+def test_unknown_values_raise_like_engine():
+    df = pd.DataFrame(ODD_MATCHES[2:3])
+    with pytest.raises(KeyError):
+        MatchTable.from_dicts(ODD_MATCHES[2:3]).match_weights()
+    with pytest.raises(KeyError):
+        compute_match_weights(df)
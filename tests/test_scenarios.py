@@ -0,0 +1,130 @@
+# ---------- tests/test_scenarios.py ----------
+# The scenario solver gives the answers of a brute force over every
+# win/loss outcome of the future matches.
+import itertools
+
+import numpy as np
+import pytest
+
+from backend import (
+    COMPETITION_FACTORS,
+    PHASE_FACTORS,
+    RANKING_THRESHOLDS_MEN,
+    RANKING_THRESHOLDS_WOMEN,
+    RANKS,
+    make_rules,
+)
+from scenarios import (
+    crossing_probability,
+    current_totals,
+    min_losses_to_fall_below,
+    min_wins_to_exceed,
+    profile_weights,
+    solve_scenarios,
+    solve_scenarios_batch,
+)
+
+THRESHOLDS = [20, 35, 42.5, 50, 57.25, 65, 80]
+
+
+def future_matches(seed, n):
+    rng = np.random.default_rng(seed)
+    return [
+        (
+            str(rng.choice(list(COMPETITION_FACTORS))),
+            str(rng.choice(list(PHASE_FACTORS))),
+            int(rng.choice(RANKS[1:])),
+            int(rng.choice(RANKS[1:])),
+            int(rng.choice(RANKS[1:])),
+        )
+        for _ in range(n)
+    ]
+
+
+# (wins, displayed ratio, probability) of every outcome of the future matches
+def outcomes(points, weights, won, lost, win_rate):
+    for wins in itertools.product([False, True], repeat=len(won)):
+        wins = np.array(wins, dtype=bool)
+        total_points = points + won[wins].sum()
+        total_weights = weights + won[wins].sum() + lost[~wins].sum()
+        ratio = round(total_points / total_weights * 100, 2)
+        probability = np.prod(np.where(wins, win_rate, 1 - win_rate))
+        yield int(wins.sum()), ratio, probability
+
+
+@pytest.fixture(params=range(6))
+def scenario(request, matches):
+    seed = request.param
+    totals = current_totals(matches(seed=seed, matches_per_player=8))
+    n_future = 4 + seed % 5
+    won, lost = profile_weights(future_matches(seed, n_future), totals["player_ranking"])
+    results = list(outcomes(totals["points"], totals["weights"], won, lost, 0.55))
+    return totals["points"], totals["weights"], won, lost, results
+
+
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+def test_min_wins_and_losses(scenario, threshold):
+    points, weights, won, lost, results = scenario
+    n = len(won)
+    above = [wins for wins, ratio, _ in results if ratio > threshold]
+    below = [n - wins for wins, ratio, _ in results if ratio < threshold]
+    assert min_wins_to_exceed(points, weights, won, lost, threshold) == (
+        min(above) if above else None
+    )
+    assert min_losses_to_fall_below(points, weights, won, lost, threshold) == (
+        min(below) if below else None
+    )
+
+
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+def test_crossing_probability(scenario, threshold):
+    points, weights, won, lost, results = scenario
+    for above in (True, False):
+        expected = sum(
+            probability
+            for _, ratio, probability in results
+            if (ratio > threshold if above else ratio < threshold)
+        )
+        probability = crossing_probability(
+            points, weights, won, lost, threshold, 0.55, above
+        )
+        assert probability == pytest.approx(expected, abs=1e-9)
+
+
+# Candidate rules apply to the weights and to the thresholds, in the batch
+# mode as for one player
+def test_rules(matches):
+    rules = make_rules(
+        {
+            "competition_factors": {**COMPETITION_FACTORS, "Tour": 1.3},
+            "thresholds_men": {
+                c: {**t, "up1": t["up1"] - 5} for c, t in RANKING_THRESHOLDS_MEN.items()
+            },
+            "thresholds_women": {
+                c: {**t, "drop": t["drop"] + 5}
+                for c, t in RANKING_THRESHOLDS_WOMEN.items()
+            },
+        }
+    )
+    df = matches(n_players=12, matches_per_player=10, seed=3)
+    profiles = future_matches(3, 6)
+    batch = solve_scenarios_batch(df, profiles, win_rate=0.5, rules=rules)
+    default = solve_scenarios_batch(df, profiles, win_rate=0.5)
+    assert not batch.equals(default)
+
+    for row, (player, player_df) in zip(
+        batch.to_dict("records"), df.groupby("numero_affiliation", sort=False)
+    ):
+        totals = current_totals(player_df, rules)
+        result = solve_scenarios(totals, profiles, win_rate=0.5, rules=rules)
+        thresholds = (
+            rules["thresholds_women"]
+            if totals["gender"] == "Dames"
+            else rules["thresholds_men"]
+        )
+        assert result.pop("thresholds") == thresholds.get(totals["category"])
+        # Missing values (None or absent) read NaN in the batch table
+        expected = {k: v for k, v in result.items() if v is not None}
+        assert {k: v for k, v in row.items() if v == v} == dict(
+            {"numero_affiliation": player}, **expected
+        )
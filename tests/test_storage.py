@@ -0,0 +1,79 @@
+# ---------- tests/test_storage.py ----------
+# The Parquet match store gives back the matches of each player in date
+# order, and the same ratios as compute_win_ratio_batch on them. An upsert
+# replaces the stored matches of the written players only.
+import os
+
+import pandas as pd
+
+from backend import compute_win_ratio_batch
+from storage import compute_win_ratio_from_store, read_matches, write_matches
+
+
+# Matches read from the store, in the columns and formats of the written ones
+def stored_matches(root, columns):
+    df = read_matches(root)
+    df["date"] = df["date"].dt.strftime("%Y-%m-%dT%H:%M:%S")
+    return df[columns]
+
+
+def test_appends_are_read_in_date_order(tmp_path, matches):
+    df = matches(n_players=20, matches_per_player=20, seed=4)
+    # Every player moves to P300 after their 5 first matches
+    later = (df.groupby("numero_affiliation").cumcount() >= 5).to_numpy()
+    df.loc[later, "classement_joueur"] = 300
+    df.loc[later, "categorie"] = "P300"
+
+    # The later matches are appended first, in the same semester partition
+    root = str(tmp_path / "matchs")
+    write_matches(root, df[later])
+    write_matches(root, df[~later])
+
+    pd.testing.assert_frame_equal(
+        stored_matches(root, df.columns), df, check_dtype=False
+    )
+    # Players come in scan order from the store
+    expected = compute_win_ratio_batch(df)
+    results = (
+        compute_win_ratio_from_store(root)
+        .sort_values("numero_affiliation")
+        .reset_index(drop=True)
+    )
+    pd.testing.assert_frame_equal(
+        results.drop(columns="ratio"), expected.drop(columns="ratio")
+    )
+    # Totals are added in scan order: equal up to the rounding
+    assert (results["ratio"] - expected["ratio"]).abs().max() <= 0.01
+
+
+def test_upsert_replaces_the_matches_of_the_written_players(tmp_path, matches):
+    df = matches(n_players=10, matches_per_player=10, seed=5)
+    # Players 1000006 to 1000009 play in the second semester
+    late = df["numero_affiliation"] >= "1000006"
+    df.loc[late, "date"] = df.loc[late, "date"].str.replace("2025-0", "2025-1")
+    root = str(tmp_path / "matchs")
+    write_matches(root, df)
+
+    # New results of the late players (all in the first semester now), of
+    # 1000000 and of a new player
+    refreshed = matches(n_players=12, matches_per_player=5, seed=6)
+    refreshed = refreshed[
+        refreshed["numero_affiliation"].isin(
+            ["1000000", "1000006", "1000007", "1000008", "1000009", "1000011"]
+        )
+    ]
+    # Writing the same results again changes nothing
+    for _ in range(2):
+        write_matches(root, refreshed, mode="upsert")
+
+    kept = df[~df["numero_affiliation"].isin(refreshed["numero_affiliation"])]
+    expected = (
+        pd.concat([kept, refreshed])
+        .sort_values(["numero_affiliation", "date"], kind="stable")
+        .reset_index(drop=True)
+    )
+    pd.testing.assert_frame_equal(
+        stored_matches(root, df.columns), expected, check_dtype=False
+    )
+    # The second semester has no match left: its partition is removed
+    assert sorted(os.listdir(root)) == ["semestre=2025H1"]
@@ -0,0 +1,71 @@
+# ---------- tests/test_streaming.py ----------
+# The streaming parser yields the elements of json.loads, wherever the
+# chunk boundaries fall.
+import json
+
+import numpy as np
+import pytest
+
+from streaming import iter_json_array_chunks
+
+PAYLOAD = [
+    1.5,
+    -5,
+    0,
+    1e3,
+    -2.5e-3,
+    "Défaite",
+    "6/2 Bless.",
+    True,
+    None,
+    [],
+    {},
+    {"Date": "2026-03-01T20:00:00", "Score": "6/4 6/3", "Valeurs": [100, 2.5]},
+    "guillemet \" et ] dans une chaîne",
+]
+
+
+def split(data, sizes):
+    chunks = []
+    start = 0
+    for size in sizes:
+        chunks.append(data[start : start + size])
+        start += size
+    chunks.append(data[start:])
+    return chunks
+
+
+@pytest.mark.parametrize(
+    "chunks, expected",
+    [
+        (["[1.", "5]"], [1.5]),
+        (["[-", "5]"], [-5]),
+        (["[1e", "3]"], [1000.0]),
+        (["[12", "34, 5", "6]"], [1234, 56]),
+        (["[tr", "ue, nu", "ll]"], [True, None]),
+        ([b'["D\xc3', b'\xa9faite"]'], ["Défaite"]),
+        ([b"\xef\xbb", b"\xbf[1]"], [1]),
+        (["  ", "[", "]", "  "], []),
+    ],
+)
+def test_chunk_boundaries(chunks, expected):
+    assert list(iter_json_array_chunks(chunks)) == expected
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("as_bytes", [False, True])
+def test_random_chunk_sizes(seed, as_bytes):
+    rng = np.random.default_rng(seed)
+    data = json.dumps(PAYLOAD, ensure_ascii=False, indent=int(rng.integers(0, 3)))
+    if as_bytes:
+        data = data.encode("utf-8")
+    sizes = rng.integers(0, 8, len(data)).tolist()
+    assert list(iter_json_array_chunks(split(data, sizes))) == PAYLOAD
+
+
+@pytest.mark.parametrize(
+    "chunks", [['{"a": 1}'], ["[1, 2"], ["[1 2]"], ["[1,", "2,"], [""]]
+)
+def test_invalid_arrays(chunks):
+    with pytest.raises(ValueError):
+        list(iter_json_array_chunks(chunks))
@@ -0,0 +1,171 @@
+# ---------- tests/test_tppwb_client.py ----------
+# Retries and timeouts of tppwb.TppwbClient against a local stub server that
+# answers each request with the next scripted action.
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from tppwb import MAX_RETRY_AFTER, TppwbClient
+
+PAYLOAD = [{"Date": "2026-07-06T23:57:00", "Score": "6/3 6/4"}]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        action = self.server.next_action()
+        if action == "drop":
+            self.close_connection = True
+            return
+        if action == "slow":
+            time.sleep(self.server.slow_delay)
+        # "429:<seconds>" answers 429 with that Retry-After
+        action, _, retry_after = action.partition(":")
+        status = int(action) if action.isdigit() else 200
+        body = json.dumps(PAYLOAD if status == 200 else {"Message": action})
+        body = body.encode("utf-8")
+        self.send_response(status)
+        if retry_after:
+            self.send_header("Retry-After", retry_after)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Actions: "ok", "503", "429:<Retry-After>", "drop" (connection closed
+# without an answer) and "slow" (answer after slow_delay). The last action
+# is repeated.
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, actions, slow_delay=1.0):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.actions = list(actions)
+        self.slow_delay = slow_delay
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def next_action(self):
+        with self._lock:
+            self.requests += 1
+            return self.actions[min(self.requests, len(self.actions)) - 1]
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(*actions, slow_delay=1.0):
+        server = StubServer(actions, slow_delay)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def make_client(server, **kwargs):
+    kwargs.setdefault("backoff", 0)
+    return TppwbClient(base_url=server.url, **kwargs)
+
+
+def test_retry_after_503(stub):
+    server = stub("503", "503", "ok")
+    assert make_client(server).get_json("/results") == PAYLOAD
+    assert server.requests == 3
+
+
+def test_retry_after_dropped_connection(stub):
+    server = stub("drop", "ok")
+    assert make_client(server).get_json("/results") == PAYLOAD
+    assert server.requests == 2
+
+
+def test_streamed_response_is_retried(stub):
+    server = stub("503", "drop", "ok")
+    assert list(make_client(server).iter_json("/results")) == PAYLOAD
+    assert server.requests == 3
+
+
+def test_gives_up_after_max_retries_on_503(stub):
+    server = stub("503")
+    with pytest.raises(requests.HTTPError):
+        make_client(server, max_retries=2).get_json("/results")
+    assert server.requests == 3
+
+
+def test_gives_up_after_max_retries_on_dropped_connections(stub):
+    server = stub("drop")
+    with pytest.raises(requests.ConnectionError):
+        make_client(server, max_retries=2).get_json("/results")
+    assert server.requests == 3
+
+
+def test_read_timeout(stub):
+    server = stub("slow", slow_delay=0.5)
+    client = make_client(server, read_timeout=0.1, max_retries=0)
+    start = time.perf_counter()
+    with pytest.raises(requests.Timeout):
+        client.get_json("/results")
+    assert time.perf_counter() - start < 0.4
+    assert server.requests == 1
+
+
+def test_retry_after_read_timeout(stub):
+    server = stub("slow", "ok", slow_delay=0.5)
+    client = make_client(server, read_timeout=0.1, max_retries=1)
+    assert client.get_json("/results") == PAYLOAD
+    assert server.requests == 2
+
+
+def test_retry_after_header_is_honored(stub):
+    server = stub("429:1", "ok")
+    start = time.perf_counter()
+    assert make_client(server).get_json("/results") == PAYLOAD
+    assert time.perf_counter() - start >= 1
+    assert server.requests == 2
+
+
+def test_gives_up_on_a_long_retry_after(stub):
+    server = stub(f"429:{MAX_RETRY_AFTER + 1}", "ok")
+    with pytest.raises(requests.HTTPError):
+        make_client(server).get_json("/results")
+    assert server.requests == 1
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.tokens = 0
+        self.deferred = []
+
+    def acquire(self):
+        self.tokens += 1
+
+    def defer(self, seconds):
+        self.deferred.append(seconds)
+
+
+def test_rate_limiter_token_per_attempt(stub):
+    server = stub("503", "drop", "429:0", "ok")
+    limiter = CountingLimiter()
+    client = make_client(server).with_rate_limiter(limiter)
+    assert client.get_json("/results") == PAYLOAD
+    assert limiter.tokens == server.requests == 4
+    assert limiter.deferred == [0]
@@ -0,0 +1,144 @@
+# ---------- tests/test_tppwb_columnar.py ----------
+# The columnar bulk normalization gives the matches of the dict-based path
+# (normalize_tppwb_data and filter_category_change) for every player.
+import datetime
+import json
+
+import numpy as np
+import pytest
+
+import cache
+from bulk_fetch import fetch_match_tables
+from tppwb import filter_category_change, normalize_tppwb_data, previous_semester_start
+from tppwb_columnar import (
+    filter_category_change_frame,
+    frame_to_matches,
+    normalize_tppwb_bodies,
+)
+
+TODAY = datetime.date(2026, 10, 17)
+PREFIXES = ["MD", "WD", "MX", "IC"]
+
+
+# Raw GetResultsByPlayer records, with WO victories, injuries, missing
+# opponent rankings and, for some players, a ranking change
+def raw_results(seed, n_matches=30):
+    rng = np.random.default_rng(seed)
+    ranks = [100, 200, 300, 500]
+    rank = int(rng.choice(ranks))
+    new_rank = int(rng.choice(ranks)) if rng.random() < 0.4 else rank
+    records = []
+    for i in range(n_matches):
+        date = datetime.datetime(2026, 1, 1) + datetime.timedelta(
+            days=int(rng.integers(0, 280)), minutes=int(rng.integers(0, 3) * 30)
+        )
+        player = new_rank if date.month >= 7 else rank
+        partner = int(rng.choice(ranks))
+        record = {
+            "Date": date.strftime("%Y-%m-%dT%H:%M:%S"),
+            "Category": str(rng.choice(PREFIXES)) + str(player),
+            "VictoryOrDefeat": "V" if rng.random() < 0.5 else "D",
+            "Score": str(rng.choice(["6/3 6/4", "0/0", "6/2 Bless.", "4/6 3/6"])),
+            "DrawType": "S" if rng.random() < 0.3 else "P",
+            "TypeTab": "Tour Final" if rng.random() < 0.1 else "",
+            "DoublePairValue": str(player + partner),
+            "PartnerDoubleValue": str(partner),
+            "OpponentDoubleValue1": str(rng.choice(ranks)),
+            "OpponentDoubleValue2": "" if i % 9 == 0 else str(rng.choice(ranks)),
+            "Extra": {"ignored": [1, 2]},
+        }
+        # Partner and opponents, missing or empty for some matches
+        if i % 5:
+            record.update(
+                PartnerAffiliationNumber=str(rng.integers(2000000, 2000050)),
+                PartnerName="" if i % 7 == 0 else f"Partenaire {i}",
+                OpponentAffiliationNumber1=str(rng.integers(2000000, 2000050)),
+                OpponentName1=f"Adversaire {i}",
+                OpponentAffiliationNumber2=str(rng.integers(2000000, 2000050)),
+                OpponentName2=f"Adversaire {i + 1}",
+            )
+        records.append(record)
+    return records
+
+
+def dict_path(records):
+    matches = normalize_tppwb_data(records)
+    return filter_category_change(matches, TODAY, previous_semester_start(TODAY))
+
+
+def columnar_path(bodies):
+    frame, errors = normalize_tppwb_bodies(bodies)
+    frame, category_changes = filter_category_change_frame(frame, TODAY)
+    return frame_to_matches(frame), category_changes, errors
+
+
+def test_bodies_match_dict_path():
+    players = {str(1000000 + i): raw_results(i, 5 + i % 40) for i in range(40)}
+    players["1000040"] = []
+    bodies = {
+        number: json.dumps(records, indent=2 if i % 3 == 0 else None).encode()
+        for i, (number, records) in enumerate(players.items())
+    }
+    matches, category_changes, errors = columnar_path(bodies)
+    assert errors == {}
+    for number, records in players.items():
+        expected, changed, _ = dict_path(records)
+        assert matches.get(number, []) == expected
+        assert (number in category_changes) == changed
+
+
+def test_unreadable_body_only_fails_its_player():
+    records = raw_results(1)
+    numbers = [dict(r, DoublePairValue=int(r["DoublePairValue"])) for r in records]
+    numbers[0]["PartnerName"] = "Ligne\nsuivante"
+    numbers[1]["PartnerAffiliationNumber"] = 2000001
+    bodies = {
+        "1": json.dumps(records).encode(),
+        "2": b"<html>erreur</html>",
+        "3": json.dumps(numbers).encode(),
+        "4": b'{"Message": "An error has occurred."}',
+    }
+    matches, _, errors = columnar_path(bodies)
+    assert sorted(errors) == ["2", "4"]
+    assert matches["1"] == dict_path(records)[0]
+    assert matches["3"] == dict_path(numbers)[0]
+
+
+class FakeClient:
+    def __init__(self, bodies):
+        self.bodies = bodies
+
+    def get_content(self, path, params=None):
+        body = self.bodies[params["affiliationNumber"]]
+        if body is None:
+            raise ConnectionError("connexion refusée")
+        return body
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, 100])
+def test_fetch_match_tables(monkeypatch, batch_size):
+    monkeypatch.setattr(cache, "_cache", None)
+    players = {str(1000000 + i): raw_results(i) for i in range(20)}
+    bodies = {number: json.dumps(r).encode() for number, r in players.items()}
+    bodies["1000020"] = None
+    batches = list(
+        fetch_match_tables(
+            bodies,
+            batch_size=batch_size,
+            client=FakeClient(bodies),
+            requests_per_second=1000,
+        )
+    )
+    assert len(batches) == -(-21 // batch_size)
+    errors = {k: v for batch in batches for k, v in batch["errors"].items()}
+    assert list(errors) == ["1000020"]
+    matches = {}
+    for batch in batches:
+        matches.update(frame_to_matches(batch["matches"]))
+    today = datetime.date.today()
+    date_from = previous_semester_start(today)
+    for number, records in players.items():
+        matches_kept, _, _ = filter_category_change(
+            normalize_tppwb_data(records), today, date_from
+        )
+        assert matches.get(number, []) == matches_kept
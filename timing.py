@@ -0,0 +1,132 @@
+# ---------- timing.py ----------
+# Lightweight timing spans around the hot paths (fetch, normalization,
+# ratio computation, rendering). Nothing is measured unless a recorder is
+# active in the current thread: span() then costs one attribute lookup.
+# Each Streamlit session runs in its own thread, so recorders do not mix.
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+
+# Totals of all recorded runs of this process, for the Prometheus export
+_totals_lock = threading.Lock()
+_span_totals = {}
+_counter_totals = {}
+
+
+class Recorder:
+    def __init__(self):
+        self.spans = []
+        self.counters = {}
+
+    def add_span(self, name, start, duration):
+        self.spans.append({"name": name, "start": start, "duration_s": duration})
+        with _totals_lock:
+            count, total = _span_totals.get(name, (0, 0.0))
+            _span_totals[name] = (count + 1, total + duration)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+        with _totals_lock:
+            _counter_totals[name] = _counter_totals.get(name, 0) + value
+
+    # Total time and number of calls per span name, in order of first use
+    def summary(self):
+        summary = {}
+        for span in self.spans:
+            entry = summary.setdefault(span["name"], {"calls": 0, "total_s": 0.0})
+            entry["calls"] += 1
+            entry["total_s"] += span["duration_s"]
+        return summary
+
+    def to_json(self):
+        return json.dumps(
+            {"spans": self.spans, "summary": self.summary(), "counters": self.counters},
+            indent=2,
+        )
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+@contextmanager
+def _recorded_span(recorder, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add_span(name, start, time.perf_counter() - start)
+
+
+def span(name):
+    recorder = getattr(_local, "recorder", None)
+    if recorder is None:
+        return _NULL_SPAN
+    return _recorded_span(recorder, name)
+
+
+def count(name, value=1):
+    recorder = getattr(_local, "recorder", None)
+    if recorder is not None:
+        recorder.count(name, value)
+
+
+def start_recording():
+    _local.recorder = Recorder()
+    return _local.recorder
+
+
+def stop_recording():
+    recorder = getattr(_local, "recorder", None)
+    _local.recorder = None
+    return recorder
+
+
+# Prometheus text exposition of the process totals (and of the persisted
+# cache counters when given, see cache.ResponseCache.stats)
+def to_prometheus(cache_stats=None):
+    with _totals_lock:
+        spans = dict(_span_totals)
+        counters = dict(_counter_totals)
+
+    lines = [
+        "# HELP aft_span_seconds Time spent in the instrumented stages.",
+        "# TYPE aft_span_seconds summary",
+    ]
+    for name, (calls, total) in sorted(spans.items()):
+        lines.append(f'aft_span_seconds_sum{{span="{name}"}} {total:.6f}')
+        lines.append(f'aft_span_seconds_count{{span="{name}"}} {calls}')
+
+    lines += [
+        "# HELP aft_events_total Events counted by the instrumented stages.",
+        "# TYPE aft_events_total counter",
+    ]
+    for name, value in sorted(counters.items()):
+        lines.append(f'aft_events_total{{event="{name}"}} {value}')
+
+    if cache_stats:
+        lines += [
+            "# HELP aft_cache_requests_total Lookups of the TPPWB response cache.",
+            "# TYPE aft_cache_requests_total counter",
+        ]
+        for endpoint, stats in sorted(cache_stats["endpoints"].items()):
+            for key, outcome in (("hits", "hit"), ("misses", "miss")):
+                lines.append(
+                    f'aft_cache_requests_total{{endpoint="{endpoint}",'
+                    f'outcome="{outcome}"}} {stats[key]}'
+                )
+        lines += [
+            "# TYPE aft_cache_entries gauge",
+            f"aft_cache_entries {cache_stats['entries']}",
+        ]
+    return "\n".join(lines) + "\n"
@@ -1,6 +1,169 @@
+import copy
 import datetime
+import email.utils
+import json
+import os
+import random
+import time
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from cache import cache_lookup, cached_call, get_cache
+from streaming import CHUNK_SIZE, iter_json_array_chunks
+from timing import count, span
+
+# Can point at a local stand-in, e.g. benchmarks/mock_tppwb.py for load tests
+TPPWB_BASE_URL = os.environ.get("TPPWB_BASE_URL", "https://padel-webapi.tppwb.be")
+
+# Server errors worth a second try (rate limiting and transient gateway failures)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Longest Retry-After (seconds) worth waiting for; beyond it the call fails
+MAX_RETRY_AFTER = 60
+
+# Identity of the partner and opponents in the raw results (same naming as
+# PartnerDoubleValue / OpponentDoubleValue1), kept as text in the matches.
+# A field missing from the raw record is left out of the normalized match.
+IDENTITY_FIELDS = {
+    "affiliation_partenaire": "PartnerAffiliationNumber",
+    "nom_partenaire": "PartnerName",
+    "affiliation_adversaire_1": "OpponentAffiliationNumber1",
+    "nom_adversaire_1": "OpponentName1",
+    "affiliation_adversaire_2": "OpponentAffiliationNumber2",
+    "nom_adversaire_2": "OpponentName2",
+}
+
+
+# Seconds to wait given by a Retry-After header (delay or HTTP date), None
+# if there is none or it cannot be read
+def retry_after_seconds(response):
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return max((date - now).total_seconds(), 0.0)
+
+
+# HTTP client shared by all TPPWB calls: pooled keep-alive connections,
+# timeouts, and bounded retries with exponential backoff and jitter.
+# An optional rate limiter (see bulk_fetch.RateLimiter) gives a token to
+# every HTTP attempt, retries included, and is told about Retry-After delays.
+class TppwbClient:
+    def __init__(
+        self,
+        base_url=TPPWB_BASE_URL,
+        connect_timeout=3.05,
+        read_timeout=15,
+        max_retries=3,
+        backoff=0.5,
+        pool_size=10,
+        rate_limiter=None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.rate_limiter = rate_limiter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {"Accept": "application/json", "Accept-Encoding": "gzip, deflate"}
+        )
+
+    # GET with retries; the response is returned once its status is final
+    def _get(self, path, params=None, stream=False):
+        url = f"{self.base_url}{path}"
+        attempt = 0
+        while True:
+            retry_after = None
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                # Upstream latency (time to the response headers when streaming)
+                with span("tppwb.http"):
+                    response = self.session.get(
+                        url, params=params, timeout=self.timeout, stream=stream
+                    )
+                if response.status_code in RETRY_STATUS_CODES:
+                    retry_after = retry_after_seconds(response)
+                if (
+                    response.status_code not in RETRY_STATUS_CODES
+                    or attempt >= self.max_retries
+                    or (retry_after is not None and retry_after > MAX_RETRY_AFTER)
+                ):
+                    response.raise_for_status()
+                    return response
+                response.close()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+            count("tppwb.retry")
+            attempt += 1
+            if retry_after is not None:
+                # The server said when to come back: hold the other callers
+                # of the rate limiter too
+                if self.rate_limiter is not None:
+                    self.rate_limiter.defer(retry_after)
+                time.sleep(retry_after)
+            else:
+                self._sleep_before_retry(attempt)
+
+    def get_json(self, path, params=None):
+        return self._get(path, params).json()
+
+    # Raw response body, for parsers that read bytes (see tppwb_columnar)
+    def get_content(self, path, params=None):
+        return self._get(path, params).content
+
+    # Generator over the elements of a JSON array response, parsed while the
+    # body is downloaded (the full body is never held in memory)
+    def iter_json(self, path, params=None):
+        response = self._get(path, params, stream=True)
+        try:
+            yield from iter_json_array_chunks(response.iter_content(CHUNK_SIZE))
+        finally:
+            response.close()
+
+    def _sleep_before_retry(self, attempt):
+        # "Full jitter" backoff: spread retries of concurrent callers
+        time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+
+    # Same client (shared connection pool) whose attempts go through
+    # `rate_limiter`
+    def with_rate_limiter(self, rate_limiter):
+        client = copy.copy(self)
+        client.rate_limiter = rate_limiter
+        return client
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = TppwbClient()
+    return _client
+
+
+def set_client(client):
+    global _client
+    _client = client
 
 
 def has_multiple_classement_joueur(matches):
@@ -12,97 +175,115 @@ def has_multiple_classement_joueur(matches):
     return len(unique_values) > 1
 
 
-# Get player results from TPPWB API and convert them to replace the JSON of this app
-def tppwb_matches(affiliation_number):
-    # Use the begining of the previous semester as start date for the matches results
-    # (Category change will be computed at the end of the semester, based on the last 12 months at most)
-    today = datetime.date.today()
+# Use the begining of the previous semester as start date for the matches results
+# (Category change will be computed at the end of the semester, based on the last 12 months at most)
+def previous_semester_start(today):
     if today.month <= 6:
         # January to June: start on July of the previous year
-        date_from = datetime.date(today.year - 1, 7, 7) # 25H2 started on July 7th for TPPWB results
-    else:
-        # July to December: start on January of the current year
-        date_from = datetime.date(today.year, 1, 1)
+        return datetime.date(today.year - 1, 7, 7) # 25H2 started on July 7th for TPPWB results
+    # July to December: start on January of the current year
+    return datetime.date(today.year, 1, 1)
+
+
+def current_semester_start(today):
+    if today.month <= 6:
+        return datetime.date(today.year, 1, 1)
+    return datetime.date(today.year, 7, 7) # 25H2 started on July 7th for TPPWB results
 
-    tppwb_data = tppwb_raw_data(affiliation_number, date_from)
+
+# Convert one raw TPPWB result to the match format of this app
+# (None for results that do not count)
+def normalize_tppwb_item(item):
+    if not isinstance(item, dict):
+        return {"genre": "Erreur dict"}  # skip non-dict items
+    if ("0/0" in item.get("Score", "") and item.get("VictoryOrDefeat") == "V") or (
+        "Bless." in item.get("Score", "")
+    ):
+        return None  # Skip WO victories and matches with injury (Bless.)
+    match = {
+        # Guess the gender from the category
+        "genre": "Dames" if item.get("Category").startswith("WD") else "Messieurs",
+        "resultat": (
+            "Victoire" if item.get("VictoryOrDefeat") == ("V") else "D\u00e9faite"
+        ),
+        # Guess the type from the category
+        "type_competition": (
+            "Tour"
+            if item.get("Category").startswith("MD")
+            or item.get("Category").startswith("WD")
+            else "Mixte" if item.get("Category").startswith("MX") else "Interclubs"
+        ),
+        # Guess the phase
+        "phase": (
+            "Tableau"
+            if item.get("DrawType") == "S" or item.get("TypeTab") == "Tour Final"
+            else "Poule"
+        ),
+        # Compute the category of the player
+        "classement_joueur": int(item.get("DoublePairValue", "0"))
+        - int(item.get("PartnerDoubleValue", "0")),
+        "classement_partenaire": (
+            int(item.get("PartnerDoubleValue", "0"))
+            if str(item.get("PartnerDoubleValue", "0")).isdigit()
+            else 0
+        ),
+        "classement_adversaire_1": (
+            int(item.get("OpponentDoubleValue1", "0"))
+            if str(item.get("OpponentDoubleValue1", "0")).isdigit()
+            else 0
+        ),
+        "classement_adversaire_2": (
+            int(item.get("OpponentDoubleValue2", "0"))
+            if str(item.get("OpponentDoubleValue2", "0")).isdigit()
+            else 0
+        ),
+        "categorie": item.get("Category", "MD100").replace("MD", "P"),
+        "date": item.get("Date"),
+    }
+    # Default to the same ranking for the 2 opponents if one is missing
+    if match["classement_adversaire_1"] == 0:
+        match["classement_adversaire_1"] = match["classement_adversaire_2"]
+    if match["classement_adversaire_2"] == 0:
+        match["classement_adversaire_2"] = match["classement_adversaire_1"]
+    for field, raw_field in IDENTITY_FIELDS.items():
+        value = item.get(raw_field)
+        if value is not None and value != "":
+            match[field] = str(value)
+    return match
+
+
+# Generator over the normalized matches of raw TPPWB results, in input order
+def iter_tppwb_matches(tppwb_data):
+    for item in tppwb_data:
+        match = normalize_tppwb_item(item)
+        if match is not None:
+            yield match
 
 
+# Convert raw TPPWB results to the match format of this app
+def normalize_tppwb_data(tppwb_data):
     # Sort by ascending order of "Date"
     tppwb_data = sorted(tppwb_data, key=lambda x: x.get("Date", ""))
+    return list(iter_tppwb_matches(tppwb_data))
 
-    matches = []
-    for item in tppwb_data:
-        if not isinstance(item, dict):
-            match = {"genre": "Erreur dict"}
-            matches.append(match)
-            continue  # skip non-dict items
-        if ("0/0" in item.get("Score", "") and item.get("VictoryOrDefeat") == "V") or (
-            "Bless." in item.get("Score", "")
-        ):
-            continue  # Skip WO victories and matches with injury (Bless.)
-        match = {
-            # Guess the gender from the category
-            "genre": "Dames" if item.get("Category").startswith("WD") else "Messieurs",
-            "resultat": (
-                "Victoire" if item.get("VictoryOrDefeat") == ("V") else "D\u00e9faite"
-            ),
-            # Guess the type from the category
-            "type_competition": (
-                "Tour"
-                if item.get("Category").startswith("MD")
-                or item.get("Category").startswith("WD")
-                else "Mixte" if item.get("Category").startswith("MX") else "Interclubs"
-            ),
-            # Guess the phase
-            "phase": (
-                "Tableau"
-                if item.get("DrawType") == "S" or item.get("TypeTab") == "Tour Final"
-                else "Poule"
-            ),
-            # Compute the category of the player
-            "classement_joueur": int(item.get("DoublePairValue", "0"))
-            - int(item.get("PartnerDoubleValue", "0")),
-            "classement_partenaire": (
-                int(item.get("PartnerDoubleValue", "0"))
-                if str(item.get("PartnerDoubleValue", "0")).isdigit()
-                else 0
-            ),
-            "classement_adversaire_1": (
-                int(item.get("OpponentDoubleValue1", "0"))
-                if str(item.get("OpponentDoubleValue1", "0")).isdigit()
-                else 0
-            ),
-            "classement_adversaire_2": (
-                int(item.get("OpponentDoubleValue2", "0"))
-                if str(item.get("OpponentDoubleValue2", "0")).isdigit()
-                else 0
-            ),
-            "categorie": item.get("Category", "MD100").replace("MD", "P"),
-            "date": item.get("Date"),
-        }
-        # Default to the same ranking for the 2 opponents if one is missing
-        if match["classement_adversaire_1"] == 0:
-            match["classement_adversaire_1"] = match["classement_adversaire_2"]
-        if match["classement_adversaire_2"] == 0:
-            match["classement_adversaire_2"] = match["classement_adversaire_1"]
-        matches.append(match)
-
-    # Ignore results of past semester if there was a category change
+
+# Same result as normalize_tppwb_data from an iterator of raw results
+# (e.g. streamed from the API): only the compact normalized matches are kept
+# in memory, and sorted on the date they carry over from the raw results
+def normalize_tppwb_stream(tppwb_items):
+    return sorted(iter_tppwb_matches(tppwb_items), key=lambda m: m.get("date") or "")
+
+
+# Ignore results of past semester if there was a category change
+def filter_category_change(matches, today, date_from):
     if has_multiple_classement_joueur(matches):
         # Determine the start date of the current semester
-        today = datetime.date.today()
-        if today.month <= 6:
-            date_from = datetime.date(today.year, 1, 1)
-        else:
-            date_from = datetime.date(today.year, 7, 7) # 25H2 started on July 7th for TPPWB results
-
-        # Filter matches to keep only those from the current semester
-        matches = [
-            m
-            for m in matches
-            if datetime.datetime.strptime(m["date"], "%Y-%m-%dT%H:%M:%S").date()
-            >= date_from
-        ]
+        date_from = current_semester_start(today)
+
+        # Filter matches to keep only those from the current semester. The
+        # dates are fixed-format ISO strings: compared as text, not parsed.
+        cutoff = date_from.isoformat()
+        matches = [m for m in matches if m["date"] >= cutoff]
         category_change = True
     else:
         category_change = False
@@ -110,31 +291,106 @@ def tppwb_matches(affiliation_number):
     return matches, category_change, date_from
 
 
+# Get player results from TPPWB API and convert them to replace the JSON of this app
+def tppwb_matches(affiliation_number, client=None):
+    today = datetime.date.today()
+    date_from = previous_semester_start(today)
+
+    with span("tppwb.fetch"):
+        tppwb_data = tppwb_raw_data(affiliation_number, date_from, client=client)
+    with span("tppwb.normalize"):
+        matches = normalize_tppwb_data(tppwb_data)
+        return filter_category_change(matches, today, date_from)
+
+
+# Same as tppwb_matches, normalizing the results while they are downloaded
+# (used by the app). The raw results are never held in memory as a whole, so
+# the cache keeps the normalized matches, which are much smaller.
+def tppwb_matches_streaming(affiliation_number, client=None):
+    today = datetime.date.today()
+    date_from = previous_semester_start(today)
+
+    # Download and normalization are interleaved, measured as one span
+    with span("tppwb.fetch"):
+        matches = cached_call(
+            get_cache(),
+            "matches",
+            f"{affiliation_number}:{date_from.isoformat()}",
+            lambda: normalize_tppwb_stream(
+                tppwb_iter_raw_data(affiliation_number, date_from, client=client)
+            ),
+        )
+    return filter_category_change(matches, today, date_from)
+
+
 
 # Get player results from TPPWB API based on affiliation number
 # https://padel-webapi.tppwb.be/Help/Api/GET-api-Players-GetResultsByPlayer_affiliationNumber_singleOrDouble_dateFrom_dateTo_top_splitVictoriesAndDefeats_splitSinglesAndDoubles
 
-def tppwb_raw_data(affiliation_number, date_from):
-    url = (
-        "https://padel-webapi.tppwb.be/api/Players/GetResultsByPlayer"
-        f"?affiliationNumber={affiliation_number}"
-        f"&singleOrDouble=D"
-        f"&splitVictoriesAndDefeats=False"
-        f"&splitSinglesAndDoubles=False"
-        f"&dateFrom={date_from.strftime('%d%m%Y')}"
+def tppwb_raw_data(affiliation_number, date_from, client=None):
+    return cached_call(
+        get_cache(),
+        "results",
+        f"{affiliation_number}:{date_from.isoformat()}",
+        lambda: (client or get_client()).get_json(
+            "/api/Players/GetResultsByPlayer",
+            params=_results_params(affiliation_number, date_from),
+        ),
+    )
+
+
+# Streaming variant of tppwb_raw_data: a generator over the raw results.
+# A cached response is reused, but a streamed one is not stored (that would
+# need the whole list in memory): tppwb_matches_streaming caches the
+# normalized matches instead.
+def tppwb_iter_raw_data(affiliation_number, date_from, client=None):
+    found, tppwb_data = cache_lookup(
+        get_cache(), "results", f"{affiliation_number}:{date_from.isoformat()}"
     )
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+    if found:
+        yield from tppwb_data
+        return
+    yield from (client or get_client()).iter_json(
+        "/api/Players/GetResultsByPlayer",
+        params=_results_params(affiliation_number, date_from),
+    )
+
+
+# Response body of tppwb_raw_data (bytes), for the columnar normalization of
+# bulk_fetch.fetch_match_tables. A cached response is reused (serialized
+# back to JSON), but a downloaded one is not stored.
+def tppwb_raw_body(affiliation_number, date_from, client=None):
+    found, tppwb_data = cache_lookup(
+        get_cache(), "results", f"{affiliation_number}:{date_from.isoformat()}"
+    )
+    if found:
+        return json.dumps(tppwb_data).encode("utf-8")
+    return (client or get_client()).get_content(
+        "/api/Players/GetResultsByPlayer",
+        params=_results_params(affiliation_number, date_from),
+    )
+
+
+def _results_params(affiliation_number, date_from):
+    return {
+        "affiliationNumber": affiliation_number,
+        "singleOrDouble": "D",
+        "splitVictoriesAndDefeats": "False",
+        "splitSinglesAndDoubles": "False",
+        "dateFrom": date_from.strftime("%d%m%Y"),
+    }
 
 
 # Get player info from TPPWB API (Name, FirstName, Rank)
 # https://padel-webapi.tppwb.be/Help/Api/GET-api-Players-SearchPlayerForAutoComplete_searchText_isNumFed
-def tppwb_player_info(affiliation_number):
-    url = (
-        "https://padel-webapi.tppwb.be/api/Players/SearchPlayerForAutoComplete"
-        f"?searchText={affiliation_number}&isNumFed=true"
+def tppwb_player_info(affiliation_number, client=None):
+    return cached_call(
+        get_cache(),
+        "player_info",
+        str(affiliation_number),
+        lambda: (client or get_client()).get_json(
+            "/api/Players/SearchPlayerForAutoComplete",
+            params={"searchText": affiliation_number, "isNumFed": "true"},
+        ),
     )
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
\ No newline at end of file
+